@@ -0,0 +1,227 @@
+# animation.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Render sequences of frames showing the celestial pole sweeping through the constellations, as the star wheel is
+turned under the viewing window of the assembled planisphere.
+
+The star wheel is rasterised only once, as is the static overlay of the holder and the RA/Dec grid. Each frame is
+then composited from these two bitmaps with a single rotation, rather than by drawing the star wheel again.
+"""
+
+import logging
+import time
+
+from typing import Iterator, Optional, Union
+
+import cairocffi as cairo
+import numpy as np
+
+from constants import unit_mm, r_1, fold_gap
+from graphics_context import GraphicsPage
+from holder import Holder
+from png_writer import AnimatedPngWriter, write_png
+from precession import precession_angle
+from ra_dec import RaDecGrid
+from settings import fetch_command_line_arguments
+from starwheel import StarWheel
+
+# The default resolution of animation frames
+animation_dots_per_inch: float = 100
+
+
+class PrecessionAnimation:
+    """
+    Render frames of an animation of the assembled planisphere, with the star wheel turned to a sequence of epochs.
+    """
+
+    def __init__(self, settings: dict, dots_per_inch: float = animation_dots_per_inch, oversampling: float = 2):
+        """
+        Render frames of an animation of the assembled planisphere. The star wheel and the overlay are rasterised
+        when this object is created.
+
+        :param settings:
+            A dictionary of settings required by the renderers of the star wheel and holder
+        :param dots_per_inch:
+            The resolution of each frame
+        :param oversampling:
+            The resolution of the rasterised star wheel, relative to the resolution of the frames
+        """
+        self.settings: dict = settings
+        self.oversampling: float = oversampling
+
+        # Each frame shows the front of the holder, with the star wheel centred on the pivot (0, -h)
+        h: float = r_1 + fold_gap
+        margin: float = 4 * unit_mm
+        self.pivot_offset: float = r_1 + margin
+
+        # Rasterise the star wheel, centred in a square bitmap
+        self.wheel: GraphicsPage = GraphicsPage(img_format="image", output="star_wheel",
+                                                width=2 * self.pivot_offset, height=2 * self.pivot_offset,
+                                                dots_per_inch=dots_per_inch * oversampling)
+        StarWheel(settings=settings).render_to_page(page=self.wheel,
+                                                    offset_x=self.pivot_offset, offset_y=self.pivot_offset)
+
+        # Rasterise the RA/Dec grid, which sits behind the front of the holder, and the front of the holder, with its
+        # viewing window cut out
+        self.overlay: GraphicsPage = GraphicsPage(img_format="image", output="overlay",
+                                                  width=2 * self.pivot_offset, height=h + self.pivot_offset + margin,
+                                                  dots_per_inch=dots_per_inch)
+        RaDecGrid(settings=settings).render_to_page(page=self.overlay,
+                                                    offset_x=self.pivot_offset, offset_y=self.pivot_offset)
+        Holder(settings={**settings, 'cut_out': True}).render_to_page(page=self.overlay,
+                                                                      offset_x=self.pivot_offset,
+                                                                      offset_y=h + self.pivot_offset)
+
+        # Each frame is composited onto the same bitmap
+        self.width: int = self.overlay.width
+        self.height: int = self.overlay.height
+        self.frame: cairo.ImageSurface = cairo.ImageSurface(cairo.FORMAT_RGB24, self.width, self.height)
+        self.context: cairo.Context = cairo.Context(self.frame)
+
+    def rotation(self, epoch: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        Return the angle through which the star wheel must be turned to line its arrow up with an epoch on the
+        holder's year scale.
+
+        :param epoch:
+            Epoch, or array of epochs, Julian years
+        :return:
+            Array of angles, radians, clockwise
+        """
+        return precession_angle(epoch=epoch) * (-1 if self.settings['southern'] else 1)
+
+    def render_frame(self, rotation: float) -> np.ndarray:
+        """
+        Composite a single frame of the animation.
+
+        :param rotation:
+            The angle through which to turn the star wheel, radians, clockwise
+        :return:
+            Array of 8-bit pixel values, with shape (height, width, 3)
+        """
+        context: cairo.Context = self.context
+        pivot: float = self.pivot_offset * self.overlay.dots_per_metre
+
+        # Paper-coloured background
+        context.set_source_rgb(1, 1, 1)
+        context.paint()
+
+        # Turn the star wheel about the pivot
+        context.save()
+        context.translate(pivot, pivot)
+        context.rotate(rotation)
+        context.scale(1 / self.oversampling, 1 / self.oversampling)
+        wheel_pivot: float = self.pivot_offset * self.wheel.dots_per_metre
+        context.translate(-wheel_pivot, -wheel_pivot)
+        context.set_source_surface(self.wheel.surface, 0, 0)
+        context.get_source().set_filter(cairo.FILTER_GOOD if self.oversampling != 1 else cairo.FILTER_BILINEAR)
+        context.paint()
+        context.restore()
+
+        # Holder and RA/Dec grid on top
+        context.set_source_surface(self.overlay.surface, 0, 0)
+        context.paint()
+
+        # Cairo stores each pixel as a native-endian 32-bit integer 0xXXRRGGBB
+        self.frame.flush()
+        stride: int = self.frame.get_stride()
+        pixels: np.ndarray = np.frombuffer(self.frame.get_data(), dtype=np.uint32)
+        pixels = pixels.reshape((self.height, stride // 4))[:, :self.width]
+        return np.stack(((pixels >> 16) & 0xFF, (pixels >> 8) & 0xFF, pixels & 0xFF), axis=-1).astype(np.uint8)
+
+    def frames(self, epochs: np.ndarray) -> Iterator[np.ndarray]:
+        """
+        Composite a frame of the animation for each of a sequence of epochs.
+
+        :param epochs:
+            Array of epochs, Julian years
+        :return:
+            Iterator over arrays of 8-bit pixel values, with shape (height, width, 3)
+        """
+        # The rotations of all the frames are computed in a single call to the precession model
+        rotation: float
+        for rotation in self.rotation(epoch=np.asarray(epochs, dtype=np.float64)):
+            yield self.render_frame(rotation=float(rotation))
+
+    def render_to_files(self, filename: str, epochs: np.ndarray, animated: bool = False,
+                        frames_per_second: float = 25, compression_level: int = 1) -> None:
+        """
+        Render an animation, either as a numbered sequence of PNG files, or as a single animated PNG file.
+
+        :param filename:
+            The filename of the animation, without file type suffix. Numbered frames have a five-digit frame number
+            appended.
+        :param epochs:
+            Array of the epochs to show in each frame, Julian years
+        :param animated:
+            If true, write a single animated PNG file. If false, write one PNG file per frame.
+        :param frames_per_second:
+            The rate at which an animated PNG file should be played
+        :param compression_level:
+            The zlib compression level of the PNG files, from 0 (fastest) to 9 (smallest)
+        :return:
+            None
+        """
+        epochs = np.asarray(epochs, dtype=np.float64)
+        start_time: float = time.time()
+
+        writer: Optional[AnimatedPngWriter] = None
+        if animated:
+            logging.info("Creating file <{}.png>".format(filename))
+            writer = AnimatedPngWriter(filename="{}.png".format(filename), width=self.width, height=self.height,
+                                       frame_count=len(epochs), frames_per_second=frames_per_second,
+                                       compression_level=compression_level)
+
+        frame_number: int
+        pixels: np.ndarray
+        for frame_number, pixels in enumerate(self.frames(epochs=epochs)):
+            if writer is not None:
+                writer.write_frame(pixels=pixels)
+            else:
+                write_png(filename="{}_{:05d}.png".format(filename, frame_number), pixels=pixels,
+                          compression_level=compression_level)
+
+        if writer is not None:
+            writer.close()
+
+        elapsed: float = time.time() - start_time
+        logging.info("Rendered {:d} frames in {:.1f} seconds ({:.1f} frames per second)".format(
+            len(epochs), elapsed, len(epochs) / max(elapsed, 1e-6)))
+
+
+# Do it right away if we're run as a script
+if __name__ == "__main__":
+    # Fetch command line arguments passed to us
+    arguments = fetch_command_line_arguments(default_filename="precession")
+
+    # Animate the pole sweeping across the years marked on the holder's year scale
+    PrecessionAnimation(settings={
+        'southern': False,
+        'language': 'en',
+        'theme': arguments['theme'],
+        'magnitude_limit': arguments['magnitude_limit'],
+        'star_catalog': arguments['star_catalog'],
+        'catalog_layout': arguments['catalog_layout'],
+        'epoch': arguments['epoch']
+    }).render_to_files(
+        filename=arguments['filename'],
+        epochs=np.linspace(-4000, 8000, arguments['frames']),
+        animated=arguments['animated']
+    )
@@ -18,20 +18,45 @@
 # ----------------------------------------------------------------------------
 
 """
-This script takes the Yale Bright Star Catalogue, and formats it into a Python list. It also adds the names of objects.
+This script takes the Yale Bright Star Catalogue, and formats it into a columnar table of stars. It also adds the
+names of objects.
 """
 
+import hashlib
+import logging
+import os
 import re
+import shutil
 
-from typing import Dict, Final, List, Tuple, Union
+from typing import Dict, Final, List, Mapping, Sequence, Union
 
+import numpy as np
 
-def fetch_bright_star_list() -> Dict[str, Union[list, dict]]:
+from catalog_cache import DataFileCache
+from fixed_width import read_fixed_width_records, decode_float_column, decode_int_column, decode_string_column
+from star_stream import BrightStarCatalogLayout
+from star_table import StarTable, StarTuple, StringColumn
+
+# The data files from which we read the star catalogue
+star_catalog_filename: Final[str] = "raw_data/bright_star_catalog.dat"
+star_names_filename: Final[str] = "raw_data/bright_star_names.dat"
+
+# Directory where we keep a processed binary copy of the star catalogue
+star_catalog_cache_directory: str = "output/cache"
+
+# Increment this whenever the processing of the catalogue changes, to invalidate binary copies on disk
+star_catalog_cache_version: Final[int] = 2
+
+
+def parse_bright_star_list(use_mmap: bool = False) -> StarTable:
     """
-    Read the Yale Bright Star Catalogue from disk, and return it as a list of stars.
+    Read the Yale Bright Star Catalogue from disk, and return it as a columnar table of stars. The fixed-width columns
+    of the catalogue are decoded in bulk using numpy.
 
+    :param use_mmap:
+        Boolean flag indicating whether to memory-map the catalogue file, rather than reading it into memory
     :return:
-        Dictionary
+        StarTable
     """
     # Astronomical unit, in metres
     au: Final[float] = 1.49598e11
@@ -39,9 +64,6 @@ def fetch_bright_star_list() -> Dict[str, Union[list, dict]]:
     # Light year, in metres
     lyr: Final[float] = 9.4605284e15
 
-    # Build a dictionary of stars, indexed by HD number
-    stars: Dict[int, Tuple[float, float, float, str, str, str, str]] = {}
-
     # Convert three-letter abbreviations of Greek letters into UTF-8
     greek_alphabet: Dict[str, str] = {
         'Alp': '\u03b1', 'Bet': '\u03b2', 'Gam': '\u03b3', 'Del': '\u03b4', 'Eps': '\u03b5',
@@ -55,7 +77,7 @@ def fetch_bright_star_list() -> Dict[str, Union[list, dict]]:
 
     # Look up the common names of bright stars
     star_names: Dict[int, str] = {}
-    with open("raw_data/bright_star_names.dat", "rt") as f_in:
+    with open(star_names_filename, "rt") as f_in:
         for line in f_in:
             # Ignore blank lines and comment lines
             if (len(line) < 5) or (line[0] == '#'):
@@ -67,82 +89,170 @@ def fetch_bright_star_list() -> Dict[str, Union[list, dict]]:
             name: str = line[5:]
             star_names[bs_num] = re.sub(' ', '_', name.strip())
 
-    # Loop through the Yale Bright Star Catalog, line by line
-    bs_num: int = 0
-    with open("raw_data/bright_star_catalog.dat", "rt") as f_in:
-        for line in f_in:
-            # Ignore blank lines and comment lines
-            if (len(line) < 100) or (line[0] == '#'):
-                continue
+    # Read the Yale Bright Star Catalog into an array of fixed-width records, ignoring blank lines and comment lines
+    bright_star_catalog_layout: BrightStarCatalogLayout = BrightStarCatalogLayout()
+    records: np.ndarray = read_fixed_width_records(filename=star_catalog_filename,
+                                                   width=bright_star_catalog_layout.record_width,
+                                                   min_length=bright_star_catalog_layout.min_length,
+                                                   use_mmap=use_mmap)
 
-            # Counter used too calculated the bright star number -- i.e. the HR number -- of each star
-            bs_num += 1
-            try:
-                # Read the Henry Draper (i.e. HD) number for this star
-                hd: int = int(line[25:31])
-
-                # Read the right ascension of this star (J2000)
-                ra_hrs: float = float(line[75:77])
-                ra_min: float = float(line[77:79])
-                ra_sec: float = float(line[79:82])
-
-                # Read the declination of this star (J2000)
-                dec_neg: bool = (line[83] == '-')
-                dec_deg: float = float(line[84:86])
-                dec_min: float = float(line[86:88])
-                dec_sec: float = float(line[88:90])
-
-                # Read the V magnitude of this star
-                mag: float = float(line[102:107])
-            except ValueError:
-                continue
+    # The bright star number -- i.e. the HR number -- of each star is its position in the catalogue
+    bs_nums: np.ndarray = np.arange(1, records.shape[0] + 1)
+
+    # Read the Henry Draper (i.e. HD) number for each star
+    hd, valid = decode_int_column(records=records, start=25, stop=31)
+
+    # Read the position and V magnitude of each star (J2000), discarding stars where any of these columns could not
+    # be parsed
+    ra, dec, mag, position_valid = bright_star_catalog_layout.decode(records=records)
+    valid &= position_valid
+
+    # Read the proper motion of each star, and its parallax and radial velocity, where these are given. Stars
+    # without these are assumed to be stationary.
+    pm_ra, pm_ra_valid = decode_float_column(records=records, start=148, stop=154)
+    pm_dec, pm_dec_valid = decode_float_column(records=records, start=154, stop=160)
+    parallax, parallax_valid = decode_float_column(records=records, start=161, stop=166)
+    radial_velocity, radial_velocity_valid = decode_float_column(records=records, start=166, stop=170)
+    pm_ra[~(pm_ra_valid & pm_dec_valid)] = 0
+    pm_dec[~(pm_ra_valid & pm_dec_valid)] = 0
+    parallax[~parallax_valid] = 0
+    radial_velocity[~radial_velocity_valid] = 0
 
-            # Look up the Bayer number of this star, if one exists
-            star_num: int = -1
-            try:
-                star_num = int(line[4:7])
-            except ValueError:
-                pass
-
-            # Render a unicode string containing the name, Flamsteed designation, and Bayer designation for this star
-            name_bayer: str = "-"
-            name_bayer_full: str = "-"
-            name_english: str = "-"
-            name_flamsteed_full: str = "-"
-
-            # Look up the Greek letter (Flamsteed designation) of this star
-            greek: str = line[7:10].strip()
-
-            # Look up the abbreviation of the constellation this star is in
-            const: str = line[11:14].strip()
-
-            # Some stars have a suffix after the Flamsteed designation, e.g. alpha-1, alpha-2, etc.
-            greek_letter_suffix: str = line[10]
-            if greek in greek_alphabet:
-                name_bayer: str = greek_alphabet[greek]
-                if greek_letter_suffix in star_suffices:
-                    name_bayer += star_suffices[greek_letter_suffix]
-                name_bayer_full: str = '{}-{}'.format(name_bayer, const)
-            if star_num > 0:
-                name_flamsteed_full: str = '{}-{}'.format(star_num, const)
-
-            # See if this is a star with a name
-            if bs_num in star_names:
-                name_english: str = star_names[bs_num]
-
-            # Turn RA and Dec from sexagesimal units into decimal
-            ra: float = (ra_hrs + ra_min / 60 + ra_sec / 3600) / 24 * 360
-            dec: float = (dec_deg + dec_min / 60 + dec_sec / 3600)
-            if dec_neg:
-                dec = -dec
-
-            # Build a dictionary is stars, indexed by HD number
-            stars[hd] = (ra, dec, mag, name_bayer, name_bayer_full, name_english, name_flamsteed_full)
-
-    hd_numbers: List[int] = list(stars.keys())
-    hd_numbers.sort()
+    # Look up the Bayer number of each star, if one exists
+    star_num, star_num_valid = decode_int_column(records=records, start=4, stop=7)
+    star_num[~star_num_valid] = -1
+
+    # Look up the Greek letter (Flamsteed designation) of each star, and the constellation it is in
+    greek: np.ndarray = decode_string_column(records=records, start=7, stop=10)
+    greek_letter_suffix: np.ndarray = decode_string_column(records=records, start=10, stop=11)
+    const: np.ndarray = decode_string_column(records=records, start=11, stop=14)
+
+    # If any HD number appears more than once, keep only its last entry
+    rows: np.ndarray = np.flatnonzero(valid)
+    last_rows: np.ndarray = rows.shape[0] - 1 - np.unique(hd[rows][::-1], return_index=True)[1]
+    rows = rows[np.sort(last_rows)]
+
+    # Render unicode strings containing the name, Flamsteed designation, and Bayer designation for each star
+    names_bayer: List[str] = []
+    names_bayer_full: List[str] = []
+    names_english: List[str] = []
+    names_flamsteed_full: List[str] = []
+
+    for i in rows.tolist():
+        name_bayer: str = "-"
+        name_bayer_full: str = "-"
+        name_english: str = "-"
+        name_flamsteed_full: str = "-"
+
+        # Some stars have a suffix after the Flamsteed designation, e.g. alpha-1, alpha-2, etc.
+        if greek[i] in greek_alphabet:
+            name_bayer = greek_alphabet[greek[i]]
+            if greek_letter_suffix[i] in star_suffices:
+                name_bayer += star_suffices[greek_letter_suffix[i]]
+            name_bayer_full = '{}-{}'.format(name_bayer, const[i])
+        if star_num[i] > 0:
+            name_flamsteed_full = '{}-{}'.format(star_num[i], const[i])
+
+        # See if this is a star with a name
+        bs_num: int = int(bs_nums[i])
+        if bs_num in star_names:
+            name_english = star_names[bs_num]
+
+        names_bayer.append(name_bayer)
+        names_bayer_full.append(name_bayer_full)
+        names_english.append(name_english)
+        names_flamsteed_full.append(name_flamsteed_full)
+
+    # Build a columnar table of stars
+    return StarTable(ra=ra[rows], dec=dec[rows], mag=mag[rows], hd=hd[rows], hr=bs_nums[rows],
+                     pm_ra=pm_ra[rows], pm_dec=pm_dec[rows], parallax=parallax[rows],
+                     radial_velocity=radial_velocity[rows],
+                     name_bayer=StringColumn.from_strings(names_bayer),
+                     name_bayer_full=StringColumn.from_strings(names_bayer_full),
+                     name_english=StringColumn.from_strings(names_english),
+                     name_flamsteed_full=StringColumn.from_strings(names_flamsteed_full))
+
+
+def source_hash(filenames: Sequence[str]) -> str:
+    """
+    Compute a hash of the contents of the raw data files from which the star catalogue is built.
+
+    :param filenames:
+        The filenames of the raw data files
+    :return:
+        Hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update("version {:d}".format(star_catalog_cache_version).encode('ascii'))
+    for filename in filenames:
+        with open(filename, "rb") as f_in:
+            digest.update(f_in.read())
+    return digest.hexdigest()
+
+
+def load_bright_star_list() -> StarTable:
+    """
+    Return the Yale Bright Star Catalogue as a columnar table of stars, memory-mapping a processed binary copy from
+    the cache directory if one exists for the current contents of the raw data files. Otherwise, parse the raw data
+    files and write a binary copy for future use.
+
+    :return:
+        StarTable
+    """
+    filenames: Sequence[str] = (star_catalog_filename, star_names_filename)
+    cache_path: str = os.path.join(star_catalog_cache_directory,
+                                   "star_catalog_{}".format(source_hash(filenames=filenames)[:16]))
+
+    # Use the binary copy of the catalogue, if one exists
+    if os.path.isdir(cache_path):
+        try:
+            return StarTable.load(directory=cache_path)
+        except (OSError, ValueError):
+            logging.info("Could not read star catalogue cache <{}>; rebuilding it".format(cache_path))
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    table: StarTable = parse_bright_star_list()
+
+    # Write a binary copy of the catalogue for future use. This is not fatal if it fails.
+    try:
+        os.makedirs(star_catalog_cache_directory, exist_ok=True)
+        table.save(directory=cache_path)
+    except OSError:
+        logging.info("Could not write star catalogue cache <{}>".format(cache_path))
+
+    return table
+
+
+# Process-wide cache of the parsed star catalogue, shared by every component
+star_catalog_cache: DataFileCache[StarTable] = DataFileCache(
+    loader=load_bright_star_list,
+    filenames=(star_catalog_filename, star_names_filename),
+    name="star catalogue"
+)
+
+
+def fetch_star_table() -> StarTable:
+    """
+    Return the Yale Bright Star Catalogue as a columnar table of stars. The catalogue is only loaded once per process,
+    unless the files it is read from change on disk.
+
+    :return:
+        StarTable
+    """
+    return star_catalog_cache.fetch()
+
+
+def fetch_bright_star_list() -> Dict[str, Union[Sequence[int], Mapping[int, StarTuple]]]:
+    """
+    Return the Yale Bright Star Catalogue as a dictionary of stars, indexed by HD number. This is a read-only view of
+    the table returned by <fetch_star_table>.
+
+    :return:
+        Dictionary
+    """
+    table: StarTable = fetch_star_table()
 
     return {
-        'stars': stars,
-        'hd_numbers': hd_numbers
+        'stars': table.as_dict(),
+        'hd_numbers': np.sort(table.hd).tolist()
     }
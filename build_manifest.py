@@ -0,0 +1,219 @@
+# build_manifest.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+A manifest recording a hash of the inputs used to build each output file, so that outputs whose inputs have not
+changed can be skipped when the planispheres are rebuilt.
+"""
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import constants
+from graphics_context import BaseComponent
+from text import text
+from themes import themes
+
+
+def hash_files(filenames: Sequence[str], prefix: bytes = b"") -> str:
+    """
+    Compute a SHA-256 hash of the names and contents of a list of files.
+
+    :param filenames:
+        The filenames of the files to hash
+    :param prefix:
+        Additional data to include in the hash, before the files
+    :return:
+        Hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256(prefix)
+    for filename in filenames:
+        digest.update(filename.encode('utf-8'))
+        with open(filename, "rb") as f_in:
+            digest.update(f_in.read())
+    return digest.hexdigest()
+
+
+# Modules whose source code is not hashed. The entries of <text.py> and <themes.py> which each component uses are
+# hashed as data instead, so that editing one translation or theme only rebuilds the outputs which use it, and
+# <settings.py> only reads the command line.
+unhashed_modules: Tuple[str, ...] = ("settings", "text", "themes")
+
+
+def imported_project_modules(filename: str) -> List[str]:
+    """
+    Return the filenames of the modules of this project which are imported by a Python source file.
+
+    :param filename:
+        The filename of the Python source file
+    :return:
+        List of filenames
+    """
+    with open(filename, "rt") as f_in:
+        tree: ast.Module = ast.parse(f_in.read(), filename=filename)
+
+    module_names: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+            module_names.add(node.module)
+
+    # Modules which are not files in this project's directory are either part of Python, or installed packages
+    directory: str = os.path.dirname(os.path.abspath(filename))
+    candidates: List[str] = [os.path.join(directory, "{}.py".format(name)) for name in sorted(module_names)
+                             if name not in unhashed_modules]
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+
+def component_source_files(component: BaseComponent) -> List[str]:
+    """
+    Return the filenames of the Python source files which may affect how a component is drawn: the module which
+    defines it, and every module of this project which that module imports, directly or indirectly.
+
+    :param component:
+        The component to be rendered
+    :return:
+        Sorted list of filenames
+    """
+    source_files: Set[str] = set()
+    pending: List[str] = [os.path.abspath(inspect.getsourcefile(type(component)))]
+    while len(pending) > 0:
+        filename: str = pending.pop()
+        if filename in source_files:
+            continue
+        source_files.add(filename)
+        pending.extend(imported_project_modules(filename=filename))
+    return sorted(source_files)
+
+
+def constant_values() -> Dict[str, float]:
+    """
+    Return all the numerical settings defined in <constants.py>.
+
+    :return:
+        Dictionary of the names and values of the settings
+    """
+    return {name: value for name, value in sorted(vars(constants).items())
+            if isinstance(value, (int, float)) and not name.startswith('_')}
+
+
+def component_input_hash(component: BaseComponent, img_format: str, dots_per_inch: float) -> str:
+    """
+    Compute a hash of all the inputs used to render a component in a particular image format: the raw data files the
+    component reads, the text and theme entries it uses, the values in <constants.py>, the source code of the modules
+    it is drawn by, and the image format.
+
+    :param component:
+        The component to be rendered
+    :param img_format:
+        The image format to be rendered
+    :param dots_per_inch:
+        The resolution to be rendered
+    :return:
+        Hexadecimal SHA-256 digest
+    """
+    settings: dict = component.settings
+
+    inputs: dict = {
+        'component': "{}.{}".format(type(component).__module__, type(component).__qualname__),
+        'settings': settings,
+        'text': text.get(settings.get('language')),
+        'theme': themes.get(settings.get('theme')),
+        'constants': constant_values(),
+        'img_format': img_format,
+        'dots_per_inch': dots_per_inch
+    }
+
+    # External star catalogues may be very large, so we identify them by their size and modification time rather than
+    # hashing their contents
+    star_catalog: Optional[str] = settings.get('star_catalog')
+    if star_catalog is not None:
+        stat_result: os.stat_result = os.stat(star_catalog)
+        inputs['star_catalog_signature'] = (stat_result.st_mtime_ns, stat_result.st_size)
+
+    filenames: List[str] = (sorted(component.data_files(settings=settings)) +
+                            component_source_files(component=component))
+    return hash_files(filenames=filenames,
+                      prefix=json.dumps(inputs, sort_keys=True, default=repr).encode('utf-8'))
+
+
+class BuildManifest:
+    """
+    A manifest recording a hash of the inputs used to build each output file. Each output has its own small record
+    file, so that several processes may build outputs in parallel without contending for the manifest.
+    """
+
+    def __init__(self, directory: str = "output/manifest"):
+        """
+        A manifest recording a hash of the inputs used to build each output file.
+
+        :param directory:
+            The directory in which to store the manifest
+        """
+        self.directory: str = directory
+
+    def _record_filename(self, output: str) -> str:
+        """
+        Return the filename of the record file for a particular output.
+        """
+        return os.path.join(self.directory, "{}.sha256".format(output.replace(os.sep, "__")))
+
+    def is_up_to_date(self, output: str, input_hash: str) -> bool:
+        """
+        Test whether an output file exists, and was built from inputs with the specified hash.
+
+        :param output:
+            The filename of the output file
+        :param input_hash:
+            The hash of the inputs the output would be built from now
+        :return:
+            Boolean flag
+        """
+        if not os.path.exists(output):
+            return False
+        try:
+            with open(self._record_filename(output=output), "rt") as f_in:
+                return f_in.read().strip() == input_hash
+        except OSError:
+            return False
+
+    def record(self, output: str, input_hash: str) -> None:
+        """
+        Record that an output file has been built from inputs with the specified hash.
+
+        :param output:
+            The filename of the output file
+        :param input_hash:
+            The hash of the inputs the output was built from
+        :return:
+            None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        record_filename: str = self._record_filename(output=output)
+        temporary_filename: str = "{}.tmp{:d}".format(record_filename, os.getpid())
+        with open(temporary_filename, "wt") as f_out:
+            f_out.write(input_hash)
+        os.replace(temporary_filename, record_filename)
+
@@ -0,0 +1,114 @@
+# catalog_cache.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+A process-wide cache of data parsed from the files in <raw_data>, so that each file is only parsed once per process.
+"""
+
+import logging
+import os
+
+from typing import Callable, Dict, Generic, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class DataFileCache(Generic[T]):
+    """
+    Hold the result of parsing one or more data files, and re-parse them only if the files change on disk.
+    """
+
+    def __init__(self, loader: Callable[[], T], filenames: Sequence[str], name: str = "data"):
+        """
+        Hold the result of parsing one or more data files, and re-parse them only if the files change on disk.
+
+        :param loader:
+            Function which parses the data files, and returns the parsed data
+        :param filenames:
+            The filenames of the data files read by <loader>. Their modification times and sizes are checked on each
+            fetch, to detect when the data needs to be re-parsed.
+        :param name:
+            Human-readable name for this cache, used in log messages
+        """
+        self.loader: Callable[[], T] = loader
+        self.filenames: Sequence[str] = filenames
+        self.name: str = name
+
+        # Count how many times we have been able to return cached data
+        self.hits: int = 0
+        self.misses: int = 0
+
+        # The parsed data, and the signature of the files it was parsed from
+        self._data: Optional[T] = None
+        self._signature: Optional[Tuple[Tuple[str, int, int], ...]] = None
+
+    def file_signature(self) -> Tuple[Tuple[str, int, int], ...]:
+        """
+        Return the modification times and sizes of all the data files we depend upon.
+
+        :return:
+            Tuple of (filename, mtime in nanoseconds, size in bytes) for each data file
+        """
+        signature = []
+        for filename in self.filenames:
+            stat_result: os.stat_result = os.stat(filename)
+            signature.append((filename, stat_result.st_mtime_ns, stat_result.st_size))
+        return tuple(signature)
+
+    def fetch(self) -> T:
+        """
+        Return the parsed data, parsing the data files only if they have not already been parsed, or if they have
+        changed on disk since they were parsed.
+
+        :return:
+            The data returned by <loader>
+        """
+        signature: Tuple[Tuple[str, int, int], ...] = self.file_signature()
+
+        if self._data is not None and signature == self._signature:
+            self.hits += 1
+            return self._data
+
+        self.misses += 1
+        logging.info("Parsing {} from <{}>".format(self.name, ", ".join(self.filenames)))
+        self._data = self.loader()
+        self._signature = signature
+        return self._data
+
+    def invalidate(self) -> None:
+        """
+        Discard the cached data, forcing the data files to be re-parsed on the next fetch.
+
+        :return:
+            None
+        """
+        self._data = None
+        self._signature = None
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        Report how many fetches have been served from the cache.
+
+        :return:
+            Dictionary with the elements 'hits' and 'misses'
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses
+        }
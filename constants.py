@@ -21,9 +21,12 @@
 The file contains global settings for the precession planisphere.
 """
 
+from functools import lru_cache
 from math import pi, sin, cos, atan2, asin
 from typing import Dict, Tuple
 
+import numpy as np
+
 # Units
 dots_per_inch: float = 200
 
@@ -59,9 +62,14 @@ inclination_ecliptic: float = 23. + 26. / 60. + 21.448 / 3600.  # Meeus (22.2)
 
 r_2: float = r_1 - r_gap
 
+# Span of declination shown on the star wheel, from the pole to its outer edge
+dec_span: float = 130
+
+# Default faintest magnitude of stars shown on the star wheel
+star_magnitude_limit: float = 4.0
+
 
 def radius(dec: float, latitude: float) -> float:
-    dec_span: float = 130
     if latitude >= 0:
         return (90 - dec) / dec_span * r_2
     else:
@@ -89,3 +97,202 @@ def transform(alt: float, az: float, latitude: float) -> Tuple[float, float]:
 
 def pos(r: float, t: float) -> Dict[str, float]:
     return {'x': r * cos(t), 'y': -r * sin(-t)}
+
+
+def radius_array(dec: np.ndarray, latitude: float) -> np.ndarray:
+    """
+    Array equivalent of <radius>.
+
+    :param dec:
+        Array of declinations, degrees
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :return:
+        Array of radii in the planispheric projection, metres
+    """
+    dec = np.asarray(dec, dtype=np.float64)
+    if latitude >= 0:
+        return (90 - dec) / dec_span * r_2
+    else:
+        return (90 + dec) / dec_span * r_2
+
+
+def transform_array(alt: np.ndarray, az: np.ndarray, latitude: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Array equivalent of <transform>. Either of <alt> and <az> may be a scalar, in which case it is broadcast against
+    the other.
+
+    :param alt:
+        Array of altitudes, degrees
+    :param az:
+        Array of azimuths, degrees
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :return:
+        Tuple of arrays (ra, dec), radians
+    """
+    alt = np.asarray(alt, dtype=np.float64) * unit_deg
+    az = np.asarray(az, dtype=np.float64) * unit_deg
+    l: float = (90 - latitude) * unit_deg
+    cos_l: float = cos(l)
+    sin_l: float = sin(l)
+    x: np.ndarray = np.cos(alt) * np.sin(az)
+    y: np.ndarray = np.cos(alt) * np.cos(az)
+    z: np.ndarray = np.sin(alt)
+    x2: np.ndarray = x * cos_l - z * sin_l
+    y2: np.ndarray = y
+    z2: np.ndarray = x * sin_l + z * cos_l
+    ra: np.ndarray = np.arctan2(x2, y2)
+    dec: np.ndarray = np.arcsin(np.clip(z2, -1, 1))
+
+    # Put south pole at the centre of southern planisphere
+    if latitude < 0:
+        dec = -dec
+    return ra, dec
+
+
+def pos_array(r: np.ndarray, t: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Array equivalent of <pos>.
+
+    :param r:
+        Array of radii, metres
+    :param t:
+        Array of azimuths, radians
+    :return:
+        Tuple of arrays (x, y), metres
+    """
+    r = np.asarray(r, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    return r * np.cos(t), -r * np.sin(-t)
+
+
+def project_array(alt: np.ndarray, az: np.ndarray, latitude: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project arrays of points from altitude and azimuth into (x, y) positions on the planisphere, by applying
+    <transform_array>, <radius_array> and <pos_array> in turn.
+
+    :param alt:
+        Array of altitudes, degrees
+    :param az:
+        Array of azimuths, degrees
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :return:
+        Tuple of arrays (x, y), metres
+    """
+    ra, dec = transform_array(alt=alt, az=az, latitude=latitude)
+    return pos_array(r=radius_array(dec=dec / unit_deg, latitude=latitude), t=ra)
+
+
+# Rotation matrix which converts equatorial Cartesian coordinates into ecliptic Cartesian coordinates (J2000)
+equatorial_to_ecliptic: np.ndarray = np.array([
+    [1, 0, 0],
+    [0, cos(inclination_ecliptic * unit_deg), sin(inclination_ecliptic * unit_deg)],
+    [0, -sin(inclination_ecliptic * unit_deg), cos(inclination_ecliptic * unit_deg)]
+])
+
+
+def ra_dec_to_ecliptic_array(ra: np.ndarray, dec: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert arrays of equatorial coordinates into ecliptic coordinates (J2000).
+
+    :param ra:
+        Array of right ascensions, hours
+    :param dec:
+        Array of declinations, degrees
+    :return:
+        Tuple of arrays (ecliptic longitude, ecliptic latitude), degrees
+    """
+    ra = np.asarray(ra, dtype=np.float64) * (pi / 12)
+    dec = np.asarray(dec, dtype=np.float64) * unit_deg
+
+    xyz: np.ndarray = np.stack((np.cos(ra) * np.cos(dec),
+                                np.sin(ra) * np.cos(dec),
+                                np.sin(dec)))
+    x2, y2, z2 = np.tensordot(equatorial_to_ecliptic, xyz, axes=1)
+
+    lat: np.ndarray = np.arcsin(np.clip(z2, -1, 1)) / unit_deg
+    lng: np.ndarray = np.arctan2(y2, x2) / unit_deg
+
+    return lng, lat
+
+
+class EclipticPositions:
+    """
+    An array of positions in ecliptic coordinates, together with the sines and cosines of their longitudes, so that
+    they can be projected onto the star wheel of either hemisphere without any further trigonometry. The southern
+    star wheel shows the sky with the signs of longitude and latitude reversed, which only flips the sign of the sines.
+    """
+
+    def __init__(self, lng: np.ndarray, lat: np.ndarray):
+        """
+        An array of positions in ecliptic coordinates.
+
+        :param lng:
+            Array of ecliptic longitudes, degrees
+        :param lat:
+            Array of ecliptic latitudes, degrees
+        """
+        self.lng: np.ndarray = np.asarray(lng, dtype=np.float64)
+        self.lat: np.ndarray = np.asarray(lat, dtype=np.float64)
+        self.cos_lng: np.ndarray = np.cos(self.lng * unit_deg)
+        self.sin_lng: np.ndarray = np.sin(self.lng * unit_deg)
+
+    def take(self, indices: np.ndarray) -> 'EclipticPositions':
+        """
+        Return a new set of positions containing only the entries with the specified indices.
+
+        :param indices:
+            Array of indices, or a Boolean mask
+        :return:
+            EclipticPositions
+        """
+        positions: EclipticPositions = EclipticPositions.__new__(EclipticPositions)
+        positions.lng = self.lng[indices]
+        positions.lat = self.lat[indices]
+        positions.cos_lng = self.cos_lng[indices]
+        positions.sin_lng = self.sin_lng[indices]
+        return positions
+
+    def project(self, latitude: float, southern: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Project these positions onto the star wheel.
+
+        :param latitude:
+            The latitude of the planisphere, degrees
+        :param southern:
+            Boolean flag indicating whether to flip the sky upside down, for a southern hemisphere planisphere
+        :return:
+            Tuple of arrays (x, y, radius), metres
+        """
+        if southern:
+            r: np.ndarray = radius_array(dec=-self.lat, latitude=latitude)
+            return -r * self.cos_lng, r * self.sin_lng, r
+        r = radius_array(dec=self.lat, latitude=latitude)
+        return -r * self.cos_lng, -r * self.sin_lng, r
+
+
+@lru_cache(maxsize=None)
+def horizon_label_position(azimuth: float, latitude: float) -> Tuple[float, float, float]:
+    """
+    Work out where to write a label along the horizon of the viewing window, and the rotation needed to write it
+    parallel to the horizon. The horizon is the same for both hemispheres, so the result is cached.
+
+    :param azimuth:
+        The azimuth of the label, degrees
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :return:
+        Tuple of (x, y, rotation), in metres and radians
+    """
+    pp: Tuple[float, float] = transform(alt=0, az=azimuth - 0.01, latitude=latitude)
+    r: float = radius(dec=pp[1] / unit_deg, latitude=latitude)
+    p: Dict[str, float] = pos(r, pp[0])
+
+    pp2: Tuple[float, float] = transform(alt=0, az=azimuth + 0.01, latitude=latitude)
+    r2: float = radius(dec=pp2[1] / unit_deg, latitude=latitude)
+    p2: Dict[str, float] = pos(r=r2, t=pp2[0])
+
+    rotation: float = -unit_rev / 4 - atan2(p2['x'] - p['x'], p2['y'] - p['y'])
+    return p['x'], p['y'], rotation
@@ -0,0 +1,200 @@
+# constellations.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Read the stick figures and the positions of the names of the constellations, and convert them into ecliptic
+coordinates. The result is cached, so that the data files are only parsed once per process. The stick figures can
+also be moved to other epochs, following the proper motions of the stars at the ends of their lines.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from catalog_cache import DataFileCache
+from constants import EclipticPositions, ra_dec_to_ecliptic_array, unit_deg
+from star_table import StarTable, unit_vectors
+
+# Data files listing the stick figures of the constellations, and the positions to write their names
+stick_figures_filename: str = "raw_data/constellation_stick_figures.dat"
+constellation_names_filename: str = "raw_data/constellation_names.dat"
+
+
+class ConstellationGeometry:
+    """
+    The stick figures of the constellations, and the positions of their names, in ecliptic coordinates.
+    """
+
+    def __init__(self, stick_names: List[str], stick_ra: np.ndarray, stick_dec: np.ndarray,
+                 label_names: List[str], label_ra: np.ndarray, label_dec: np.ndarray):
+        """
+        The stick figures of the constellations, and the positions of their names.
+
+        :param stick_names:
+            The name of the constellation each stick-figure line belongs to
+        :param stick_ra:
+            The right ascensions of the two ends of each line, degrees, as an array with shape (number of lines, 2)
+        :param stick_dec:
+            The declinations of the two ends of each line, degrees, as an array with shape (number of lines, 2)
+        :param label_names:
+            The name of each constellation, with underscores in place of spaces
+        :param label_ra:
+            The right ascensions where each name is written, degrees
+        :param label_dec:
+            The declinations where each name is written, degrees
+        """
+        self.stick_names: List[str] = stick_names
+        self.stick_ra: np.ndarray = stick_ra
+        self.stick_dec: np.ndarray = stick_dec
+        self.label_names: List[str] = label_names
+        self.label_ra: np.ndarray = label_ra
+        self.label_dec: np.ndarray = label_dec
+
+        # The positions of the ends of each line, and of each name, in ecliptic coordinates
+        self.sticks: EclipticPositions = EclipticPositions(*ra_dec_to_ecliptic_array(ra=stick_ra * 12 / 180,
+                                                                                     dec=stick_dec))
+        self.labels: EclipticPositions = EclipticPositions(*ra_dec_to_ecliptic_array(ra=label_ra * 12 / 180,
+                                                                                     dec=label_dec))
+
+        # The star in the catalogue at the end of each line, and the table they were found in; found on first use
+        self._stick_rows: Optional[np.ndarray] = None
+        self._stick_table: Optional[StarTable] = None
+
+    def stick_star_rows(self, table: StarTable) -> np.ndarray:
+        """
+        Find the star in a star catalogue at each end of each stick-figure line.
+
+        :param table:
+            The table of stars to search
+        :return:
+            Array of row numbers within the table, with shape (number of lines, 2), or -1 where no star was found
+        """
+        if self._stick_table is not table:
+            self._stick_rows = table.match_positions(ra=self.stick_ra, dec=self.stick_dec)
+            self._stick_table = table
+        return self._stick_rows
+
+    def at_epoch(self, table: StarTable, epoch: float, label_neighbours: int = 5) -> 'ConstellationGeometry':
+        """
+        Return the stick figures of the constellations as they appear at another epoch. Each end of each line moves
+        with the star at that position in a star catalogue, and each name moves with the mean motion of the
+        stick-figure stars nearest to it. Line ends with no star in the catalogue do not move.
+
+        :param table:
+            The table of stars whose proper motions to use
+        :param epoch:
+            The epoch, Julian years
+        :param label_neighbours:
+            The number of stick-figure stars whose motions each name follows
+        :return:
+            ConstellationGeometry
+        """
+        rows: np.ndarray = self.stick_star_rows(table=table)
+        matched: np.ndarray = rows >= 0
+
+        # Move each of the stars in the stick figures
+        star_rows: np.ndarray = np.unique(rows[matched])
+        star_ra, star_dec = table.positions_at_epoch(epoch=epoch, rows=star_rows)
+        star_index: np.ndarray = np.searchsorted(star_rows, rows[matched])
+
+        stick_ra: np.ndarray = self.stick_ra.copy()
+        stick_dec: np.ndarray = self.stick_dec.copy()
+        stick_ra[matched] = star_ra[star_index]
+        stick_dec[matched] = star_dec[star_index]
+
+        # Move each name by the mean motion of the nearest stick-figure stars
+        star_before: np.ndarray = unit_vectors(ra=table.ra[star_rows], dec=table.dec[star_rows])
+        star_after: np.ndarray = unit_vectors(ra=star_ra, dec=star_dec)
+        label_before: np.ndarray = unit_vectors(ra=self.label_ra, dec=self.label_dec)
+        neighbours: np.ndarray = np.argsort(-(label_before @ star_before.T), axis=1,
+                                            kind='stable')[:, :label_neighbours]
+        label_after: np.ndarray = label_before + np.mean((star_after - star_before)[neighbours], axis=1)
+
+        label_ra: np.ndarray = np.mod(np.arctan2(label_after[:, 1], label_after[:, 0]), 2 * np.pi) / unit_deg
+        label_dec: np.ndarray = np.arctan2(label_after[:, 2], np.hypot(label_after[:, 0], label_after[:, 1])) / unit_deg
+
+        return ConstellationGeometry(stick_names=self.stick_names, stick_ra=stick_ra, stick_dec=stick_dec,
+                                     label_names=self.label_names, label_ra=label_ra, label_dec=label_dec)
+
+
+def read_data_columns(filename: str, column_count: int) -> Tuple[List[str], np.ndarray]:
+    """
+    Read a text file where each line contains a name followed by a number of numerical columns. Blank lines and
+    comment lines are ignored, as are any columns after the ones we need.
+
+    :param filename:
+        The filename of the text file to read
+    :param column_count:
+        The number of numerical columns to read after the name
+    :return:
+        Tuple of (list of names, array of numbers with shape (number of lines, column_count))
+    """
+    names: List[str] = []
+    values: List[List[float]] = []
+    with open(filename, "rt") as f_in:
+        for line in f_in:
+            line = line.strip()
+
+            # Ignore blank lines and comment lines
+            if (len(line) == 0) or (line[0] == '#'):
+                continue
+
+            words: List[str] = line.split()
+            names.append(words[0])
+            values.append([float(item) for item in words[1:column_count + 1]])
+
+    return names, np.array(values, dtype=np.float64).reshape((-1, column_count))
+
+
+def load_constellation_geometry() -> ConstellationGeometry:
+    """
+    Read the stick figures and the positions of the names of the constellations, and convert them into ecliptic
+    coordinates.
+
+    :return:
+        ConstellationGeometry
+    """
+    # Each stick-figure line is listed as the name of the constellation, followed by the RA and Dec of each end, in
+    # degrees
+    stick_names, sticks = read_data_columns(filename=stick_figures_filename, column_count=4)
+
+    # Each name is listed as the name of the constellation, followed by the RA (in hours) and Dec to write it at
+    label_names, labels = read_data_columns(filename=constellation_names_filename, column_count=2)
+
+    return ConstellationGeometry(stick_names=stick_names, stick_ra=sticks[:, [0, 2]], stick_dec=sticks[:, [1, 3]],
+                                 label_names=label_names, label_ra=labels[:, 0] * 180 / 12, label_dec=labels[:, 1])
+
+
+# Process-wide cache of the constellation geometry
+constellation_geometry_cache: DataFileCache[ConstellationGeometry] = DataFileCache(
+    loader=load_constellation_geometry,
+    filenames=(stick_figures_filename, constellation_names_filename),
+    name="constellation geometry"
+)
+
+
+def fetch_constellation_geometry() -> ConstellationGeometry:
+    """
+    Return the stick figures and the positions of the names of the constellations, in ecliptic coordinates. The
+    data files are only parsed once per process, unless they change on disk.
+
+    :return:
+        ConstellationGeometry
+    """
+    return constellation_geometry_cache.fetch()
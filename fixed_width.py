@@ -0,0 +1,276 @@
+# fixed_width.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Helper functions for decoding fixed-width text files, such as the Yale Bright Star Catalogue, in bulk using numpy.
+
+Each file is read into a two-dimensional array of bytes, with one row per line of text, and each column of the file
+is then decoded in a single numpy operation.
+"""
+
+import gzip
+import mmap
+import os
+
+from typing import IO, Iterator, List, Tuple
+
+import numpy as np
+
+# Characters which may legitimately appear in a numeric column
+_numeric_characters: np.ndarray = np.zeros(256, dtype=bool)
+_numeric_characters[np.frombuffer(b"0123456789 .+-eE", dtype=np.uint8)] = True
+
+_digit_characters: np.ndarray = np.zeros(256, dtype=bool)
+_digit_characters[np.frombuffer(b"0123456789", dtype=np.uint8)] = True
+
+
+def split_fixed_width_records(data: np.ndarray, width: int, min_length: int = 0,
+                              comment_character: str = '#') -> np.ndarray:
+    """
+    Split a buffer of text into lines, and return the lines as rows of a two-dimensional array of bytes. Short lines
+    are padded with spaces.
+
+    :param data:
+        One-dimensional array of bytes, containing the text to split into lines
+    :param width:
+        The number of characters to keep from the start of each line
+    :param min_length:
+        Discard lines shorter than this number of characters, including the newline character
+    :param comment_character:
+        Discard lines which begin with this character
+    :return:
+        Array of bytes, with shape (number of lines, width)
+    """
+    if data.shape[0] == 0:
+        return np.zeros((0, width), dtype=np.uint8)
+
+    # Find where each line starts and ends
+    line_ends: np.ndarray = np.flatnonzero(data == ord('\n'))
+    has_newline: np.ndarray = np.ones(line_ends.shape[0], dtype=np.int64)
+    if line_ends.shape[0] == 0 or line_ends[-1] != data.shape[0] - 1:
+        # Final line of file has no newline character
+        line_ends = np.append(line_ends, data.shape[0])
+        has_newline = np.append(has_newline, 0)
+    line_starts: np.ndarray = np.concatenate(([0], line_ends[:-1] + 1))
+    line_lengths: np.ndarray = line_ends - line_starts
+
+    # Ignore short lines and comment lines
+    selected: np.ndarray = (line_lengths + has_newline) >= max(min_length, 1)
+    selected[selected] &= data[line_starts[selected]] != ord(comment_character)
+    line_starts = line_starts[selected]
+    line_lengths = line_lengths[selected]
+
+    # Gather the first <width> characters of each line, padding short lines with spaces
+    columns: np.ndarray = np.arange(width)
+    indices: np.ndarray = np.minimum(line_starts[:, np.newaxis] + columns[np.newaxis, :], data.shape[0] - 1)
+    return np.where(columns[np.newaxis, :] < line_lengths[:, np.newaxis], data[indices], ord(' ')).astype(np.uint8)
+
+
+def read_fixed_width_records(filename: str, width: int, min_length: int = 0, comment_character: str = '#',
+                             use_mmap: bool = False) -> np.ndarray:
+    """
+    Read a fixed-width text file from disk, and return its lines as rows of a two-dimensional array of bytes.
+
+    :param filename:
+        The filename of the text file to read
+    :param width:
+        The number of characters to keep from the start of each line
+    :param min_length:
+        Discard lines shorter than this number of characters, including the newline character
+    :param comment_character:
+        Discard lines which begin with this character
+    :param use_mmap:
+        Boolean flag indicating whether to memory-map the file, rather than reading it into memory
+    :return:
+        Array of bytes, with shape (number of lines, width)
+    """
+    with open(filename, "rb") as f_in:
+        if not use_mmap or os.fstat(f_in.fileno()).st_size == 0:
+            return split_fixed_width_records(data=np.frombuffer(f_in.read(), dtype=np.uint8), width=width,
+                                             min_length=min_length, comment_character=comment_character)
+
+        with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            data: np.ndarray = np.frombuffer(buffer, dtype=np.uint8)
+            records: np.ndarray = split_fixed_width_records(data=data, width=width, min_length=min_length,
+                                                            comment_character=comment_character)
+            # Release our view of the memory-mapped buffer before it is closed
+            del data
+            return records
+
+
+def iterate_fixed_width_records(filename: str, width: int, chunk_size: int = 65536, min_length: int = 0,
+                                comment_character: str = '#', block_size: int = 1 << 22) -> Iterator[np.ndarray]:
+    """
+    Read a fixed-width text file from disk in chunks, and yield its lines as rows of two-dimensional arrays of bytes,
+    each containing <chunk_size> lines, except for the last. The file may be compressed with gzip, in which case its
+    filename should end in <.gz>. Memory usage is bounded by the chunk size and block size, and does not depend on
+    the size of the file.
+
+    :param filename:
+        The filename of the text file to read
+    :param width:
+        The number of characters to keep from the start of each line
+    :param chunk_size:
+        The number of lines to yield in each chunk
+    :param min_length:
+        Discard lines shorter than this number of characters, including the newline character
+    :param comment_character:
+        Discard lines which begin with this character
+    :param block_size:
+        The number of bytes to read from the file at a time
+    :return:
+        Iterator over arrays of bytes, each with shape (number of lines, width)
+    """
+    # Lines which have been read, but not yet yielded
+    pending: List[np.ndarray] = []
+    pending_count: int = 0
+
+    # The incomplete line at the end of the last block we read
+    remainder: bytes = b""
+
+    f_in: IO[bytes]
+    with (gzip.open(filename, "rb") if filename.endswith(".gz") else open(filename, "rb")) as f_in:
+        while True:
+            block: bytes = f_in.read(block_size)
+            at_end: bool = len(block) == 0
+            data: bytes = remainder + block
+
+            # Only split complete lines, unless we have reached the end of the file
+            cut: int = len(data) if at_end else data.rfind(b"\n") + 1
+            remainder = data[cut:]
+            if cut > 0:
+                records: np.ndarray = split_fixed_width_records(data=np.frombuffer(data[:cut], dtype=np.uint8),
+                                                                width=width, min_length=min_length,
+                                                                comment_character=comment_character)
+                pending.append(records)
+                pending_count += records.shape[0]
+
+            # Yield as many full chunks as we can
+            while pending_count >= chunk_size or (at_end and pending_count > 0):
+                lines: np.ndarray = np.concatenate(pending) if len(pending) > 1 else pending[0]
+                yield lines[:chunk_size]
+                pending = [lines[chunk_size:]]
+                pending_count = pending[0].shape[0]
+
+            if at_end:
+                return
+
+
+def column_bytes(records: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Extract a column from an array of fixed-width records, as an array of byte strings.
+
+    :param records:
+        Array of bytes, with shape (number of lines, width)
+    :param start:
+        The first character of the column (zero-based, as in Python string slicing)
+    :param stop:
+        The character after the last character of the column
+    :return:
+        Array of byte strings of length (stop - start)
+    """
+    return np.ascontiguousarray(records[:, start:stop]).view("S{:d}".format(stop - start))[:, 0]
+
+
+def _decode_numeric_column(records: np.ndarray, start: int, stop: int, dtype: type,
+                           allowed_characters: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode a numeric column from an array of fixed-width records. Entries which cannot be parsed are flagged as
+    invalid, and set to zero.
+
+    :return:
+        Tuple of (values, valid), where <valid> is a Boolean array indicating which entries were successfully parsed
+    """
+    field: np.ndarray = records[:, start:stop]
+
+    # Quickly rule out blank fields, or fields containing characters which cannot form a number
+    valid: np.ndarray = (np.all(allowed_characters[field], axis=1) &
+                         np.any(_digit_characters[field], axis=1))
+    values: np.ndarray = np.zeros(records.shape[0], dtype=dtype)
+
+    strings: np.ndarray = column_bytes(records=records, start=start, stop=stop)[valid]
+    try:
+        values[valid] = strings.astype(dtype)
+    except ValueError:
+        # Fall back to parsing the remaining entries one by one, to find out which are malformed
+        parsed: np.ndarray = np.zeros(strings.shape[0], dtype=dtype)
+        parsed_valid: np.ndarray = np.zeros(strings.shape[0], dtype=bool)
+        for i, item in enumerate(strings):
+            try:
+                parsed[i] = dtype(item.decode('ascii'))
+                parsed_valid[i] = True
+            except ValueError:
+                pass
+        values[valid] = parsed
+        valid[valid] = parsed_valid
+
+    return values, valid
+
+
+def decode_float_column(records: np.ndarray, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode a column of floating-point numbers from an array of fixed-width records.
+
+    :param records:
+        Array of bytes, with shape (number of lines, width)
+    :param start:
+        The first character of the column (zero-based, as in Python string slicing)
+    :param stop:
+        The character after the last character of the column
+    :return:
+        Tuple of (values, valid), where <valid> is a Boolean array indicating which entries were successfully parsed
+    """
+    return _decode_numeric_column(records=records, start=start, stop=stop, dtype=float,
+                                  allowed_characters=_numeric_characters)
+
+
+def decode_int_column(records: np.ndarray, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode a column of integers from an array of fixed-width records.
+
+    :param records:
+        Array of bytes, with shape (number of lines, width)
+    :param start:
+        The first character of the column (zero-based, as in Python string slicing)
+    :param stop:
+        The character after the last character of the column
+    :return:
+        Tuple of (values, valid), where <valid> is a Boolean array indicating which entries were successfully parsed
+    """
+    allowed_characters: np.ndarray = _numeric_characters.copy()
+    allowed_characters[np.frombuffer(b".eE", dtype=np.uint8)] = False
+    return _decode_numeric_column(records=records, start=start, stop=stop, dtype=int,
+                                  allowed_characters=allowed_characters)
+
+
+def decode_string_column(records: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Decode a column of text from an array of fixed-width records, with surrounding whitespace removed.
+
+    :param records:
+        Array of bytes, with shape (number of lines, width)
+    :param start:
+        The first character of the column (zero-based, as in Python string slicing)
+    :param stop:
+        The character after the last character of the column
+    :return:
+        Array of unicode strings
+    """
+    return np.char.strip(column_bytes(records=records, start=start, stop=stop)).astype(str)
+
@@ -23,14 +23,273 @@ A thin wrapper to produce vector graphics using cairo.
 
 import logging
 
+from collections import OrderedDict
 from math import pi, sin, cos
 
-from typing import Dict, List, Optional, Sequence, Union
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
 
 import cairocffi as cairo
+import numpy as np
 from constants import unit_deg, unit_mm, font_size_base, line_width_base, dots_per_inch
 
 
+def encode_polyline_path(xs: np.ndarray, ys: np.ndarray, close: bool = False) -> np.ndarray:
+    """
+    Encode a polyline as an array laid out in memory as an array of cairo_path_data_t elements, so that it can be
+    passed to cairo in a single call without any per-vertex Python code.
+
+    Each vertex takes two 16-byte elements: a header (int32 type, int32 length) and a point (float64 x, float64 y).
+
+    :param xs:
+        Array of the horizontal positions of the vertices, metres
+    :param ys:
+        Array of the vertical positions of the vertices, metres
+    :param close:
+        Boolean flag indicating whether to close the polyline into a polygon
+    :return:
+        Array of float64 with shape (number of elements, 2)
+    """
+    xs = np.asarray(xs, dtype=np.float64).ravel()
+    ys = np.asarray(ys, dtype=np.float64).ravel()
+    vertex_count: int = xs.shape[0]
+
+    data: np.ndarray = np.zeros((2 * vertex_count + (1 if close else 0), 2), dtype=np.float64)
+    headers: np.ndarray = data.view(np.int32)
+
+    # Headers: the first vertex is a move_to, and all subsequent vertices are line_tos
+    headers[0:2 * vertex_count:2, 0] = cairo.PATH_LINE_TO
+    headers[0, 0] = cairo.PATH_MOVE_TO
+    headers[0:2 * vertex_count:2, 1] = 2
+
+    # Points
+    data[1:2 * vertex_count:2, 0] = xs
+    data[1:2 * vertex_count:2, 1] = ys
+
+    if close:
+        headers[-1, 0] = cairo.PATH_CLOSE_PATH
+        headers[-1, 1] = 1
+
+    return data
+
+
+def encode_segments_path(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> np.ndarray:
+    """
+    Encode a set of straight line segments, each as a separate sub-path, as an array laid out in memory as an array of
+    cairo_path_data_t elements, so that they can be passed to cairo in a single call without any per-segment Python
+    code.
+
+    :param x0:
+        Array of the horizontal positions of the start of each segment, metres
+    :param y0:
+        Array of the vertical positions of the start of each segment, metres
+    :param x1:
+        Array of the horizontal positions of the end of each segment, metres
+    :param y1:
+        Array of the vertical positions of the end of each segment, metres
+    :return:
+        Array of float64 with shape (number of elements, 2)
+    """
+    x0 = np.asarray(x0, dtype=np.float64).ravel()
+
+    # Each segment is a move_to and a line_to, each of which takes two elements
+    data: np.ndarray = np.zeros((x0.shape[0], 4, 2), dtype=np.float64)
+    headers: np.ndarray = data.view(np.int32)
+
+    headers[:, 0, 0] = cairo.PATH_MOVE_TO
+    headers[:, 2, 0] = cairo.PATH_LINE_TO
+    headers[:, 0::2, 1] = 2
+
+    data[:, 1, 0] = x0
+    data[:, 1, 1] = np.asarray(y0, dtype=np.float64).ravel()
+    data[:, 3, 0] = np.asarray(x1, dtype=np.float64).ravel()
+    data[:, 3, 1] = np.asarray(y1, dtype=np.float64).ravel()
+
+    return data.reshape((-1, 2))
+
+
+# The distance of the control points of a cubic Bézier curve approximating a quarter circle, in units of its radius
+bezier_quarter_circle: float = 4 / 3 * (2 ** 0.5 - 1)
+
+
+def encode_discs_path(xs: np.ndarray, ys: np.ndarray, radii: np.ndarray) -> np.ndarray:
+    """
+    Encode a set of circles as an array laid out in memory as an array of cairo_path_data_t elements, so that they
+    can be passed to cairo in a single call without any per-circle Python code. Each circle is a closed sub-path
+    made of four cubic Bézier curves, drawn in the same direction as <GraphicsContext.circle>.
+
+    :param xs:
+        Array of the horizontal positions of the centres of the circles, metres
+    :param ys:
+        Array of the vertical positions of the centres of the circles, metres
+    :param radii:
+        Array of the radii of the circles, metres
+    :return:
+        Array of float64 with shape (number of elements, 2)
+    """
+    xs = np.asarray(xs, dtype=np.float64).ravel()
+    ys = np.asarray(ys, dtype=np.float64).ravel()
+    radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), xs.shape)
+
+    # Each circle is a move_to (2 elements), four curve_tos (4 elements each) and a close_path (1 element)
+    elements_per_circle: int = 19
+    data: np.ndarray = np.zeros((xs.shape[0], elements_per_circle, 2), dtype=np.float64)
+    headers: np.ndarray = data.view(np.int32)
+
+    headers[:, 0, 0] = cairo.PATH_MOVE_TO
+    headers[:, 0, 1] = 2
+    data[:, 1, 0] = xs + radii
+    data[:, 1, 1] = ys
+
+    # Quarter circles, starting at angle zero and proceeding in the direction of increasing angle
+    k: np.ndarray = bezier_quarter_circle * radii
+    quarter: int
+    for quarter in range(4):
+        theta_0: float = quarter * pi / 2
+        theta_1: float = (quarter + 1) * pi / 2
+        c0: float = round(cos(theta_0))
+        s0: float = round(sin(theta_0))
+        c1: float = round(cos(theta_1))
+        s1: float = round(sin(theta_1))
+        i: int = 2 + 4 * quarter
+        headers[:, i, 0] = cairo.PATH_CURVE_TO
+        headers[:, i, 1] = 4
+        data[:, i + 1, 0] = xs + radii * c0 - k * s0
+        data[:, i + 1, 1] = ys + radii * s0 + k * c0
+        data[:, i + 2, 0] = xs + radii * c1 + k * s1
+        data[:, i + 2, 1] = ys + radii * s1 - k * c1
+        data[:, i + 3, 0] = xs + radii * c1
+        data[:, i + 3, 1] = ys + radii * s1
+
+    headers[:, -1, 0] = cairo.PATH_CLOSE_PATH
+    headers[:, -1, 1] = 1
+
+    return data.reshape((-1, 2))
+
+
+def minimum_raggedness_breaks(word_widths: Sequence[float], space_width: float, width: float) -> List[int]:
+    """
+    Choose where to break a paragraph into lines so as to minimise the sum of the squares of the unused space at the
+    end of each line except the last, in the style of the Knuth-Plass algorithm. Each line only considers the
+    preceding words which could share a line with it, so the running time is linear in the length of the paragraph.
+
+    :param word_widths:
+        The advance width of each word in the paragraph, metres
+    :param space_width:
+        The advance width of the space between words, metres
+    :param width:
+        The maximum allowed length of each line, metres
+    :return:
+        List of the indices of the first word on each line
+    """
+    word_count: int = len(word_widths)
+    if word_count == 0:
+        return [0]
+
+    # Cumulative width of the words, so that the width of any run of words is a single subtraction
+    cumulative_width: np.ndarray = np.concatenate(([0.], np.cumsum(word_widths)))
+
+    # cost[j] is the smallest badness of any way of setting the first j words, where the j-th word ends a line
+    cost: List[float] = [0.] + [float('inf')] * word_count
+    line_start: List[int] = [0] * (word_count + 1)
+
+    for j in range(1, word_count + 1):
+        is_last_line: bool = j == word_count
+        for i in range(j - 1, -1, -1):
+            line_width: float = cumulative_width[j] - cumulative_width[i] + (j - i - 1) * space_width
+            # A word which is too long to fit on any line is set on a line of its own
+            if line_width > width and i < j - 1:
+                break
+            slack: float = max(width - line_width, 0)
+            candidate: float = cost[i] + (0 if is_last_line else slack * slack)
+            if candidate < cost[j]:
+                cost[j] = candidate
+                line_start[j] = i
+
+    # Trace the chosen breaks back from the end of the paragraph
+    breaks: List[int] = []
+    j: int = word_count
+    while j > 0:
+        j = line_start[j]
+        breaks.append(j)
+    return breaks[::-1]
+
+
+class TextExtentCache:
+    """
+    A bounded least-recently-used cache of the dimensions of text strings measured by cairo, shared by all
+    GraphicsContexts in this process.
+    """
+
+    def __init__(self, max_size: int = 16384):
+        """
+        A bounded least-recently-used cache of the dimensions of text strings measured by cairo.
+
+        :param max_size:
+            The maximum number of text strings whose dimensions we remember
+        """
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._extents: OrderedDict = OrderedDict()
+
+    def lookup(self, key: Hashable) -> Optional[Tuple[float, ...]]:
+        """
+        Look up the dimensions of a text string.
+
+        :param key:
+            Tuple describing the text string, the font it is rendered in, and the transformation matrix in use
+        :return:
+            The (x, y, width, height, dx, dy) extents tuple returned by cairo, or None if not in the cache
+        """
+        extents: Optional[Tuple[float, ...]] = self._extents.get(key)
+        if extents is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._extents.move_to_end(key)
+        return extents
+
+    def store(self, key: Hashable, extents: Tuple[float, ...]) -> None:
+        """
+        Record the dimensions of a text string, discarding the least-recently-used entry if the cache is full.
+
+        :param key:
+            Tuple describing the text string, the font it is rendered in, and the transformation matrix in use
+        :param extents:
+            The (x, y, width, height, dx, dy) extents tuple returned by cairo
+        :return:
+            None
+        """
+        self._extents[key] = extents
+        if len(self._extents) > self.max_size:
+            self._extents.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Empty the cache, and reset its counters.
+        """
+        self._extents.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        Report how many text measurements have been served from the cache.
+
+        :return:
+            Dictionary with the elements 'hits', 'misses' and 'size'
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._extents)
+        }
+
+
+# Process-wide cache of text dimensions, shared by every GraphicsContext
+text_extent_cache: TextExtentCache = TextExtentCache()
+
+
 class GraphicsPage:
     """
     A thin wrapper to produce vector graphics using cairo. This class represents a page / image file we are going
@@ -59,8 +318,9 @@ class GraphicsPage:
             The dots per inch resolution to render this page
         """
 
-        # PDF surfaces are always measured in points
-        if img_format in ("pdf", "svg"):
+        # PDF surfaces are always measured in points. Recording surfaces are also measured in points, so that they can
+        # be replayed onto PDF and SVG surfaces without rescaling.
+        if img_format in ("pdf", "svg", "recording"):
             dots_per_inch = 72.
 
         self.format: str = img_format
@@ -76,6 +336,13 @@ class GraphicsPage:
             self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.width, self.height)
         elif self.format == "svg":
             self.surface = cairo.SVGSurface(self.output, self.width, self.height)
+        elif self.format == "recording":
+            # Record the full (unrounded) extent of the page, since it may be replayed at a higher resolution
+            self.surface = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA,
+                                                  (0, 0, width * self.dots_per_metre, height * self.dots_per_metre))
+        elif self.format == "image":
+            # A bitmap image which is kept in memory, for compositing into other images
+            self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.width, self.height)
         else:
             assert False, "Unknown image output format {}".format(self.format)
 
@@ -91,7 +358,8 @@ class GraphicsPage:
         if self.surface is None:
             return
 
-        logging.info("Creating file <{}>".format(self.output))
+        if self.format not in ("recording", "image"):
+            logging.info("Creating file <{}>".format(self.output))
 
         if self.format == "pdf":
             self.surface.show_page()
@@ -99,6 +367,9 @@ class GraphicsPage:
             self.surface.write_to_png(self.output)
         elif self.format == "svg":
             self.surface.show_page()
+        elif self.format in ("recording", "image"):
+            # Recording surfaces and in-memory images are not saved to disk
+            pass
         else:
             assert False, "Unknown image output format {}".format(self.format)
 
@@ -116,6 +387,36 @@ class GraphicsPage:
     def supported_formats() -> Sequence[str]:
         return "pdf", "png", "svg"
 
+    def new_page(self) -> None:
+        """
+        Finish the current page of a multi-page PDF document, and start a new page of the same size.
+
+        :return:
+            None
+        """
+        assert self.format == "pdf", "Only PDF documents can have multiple pages"
+        self.surface.show_page()
+
+    def paint_page(self, source: 'GraphicsPage') -> None:
+        """
+        Replay the drawing operations recorded on another page onto this page. This is normally used to replay a page
+        of format "recording" onto pages of other formats, without re-running the code which drew it.
+
+        :param source:
+            The GraphicsPage to copy onto this page. It should have the same physical dimensions as this page.
+        :return:
+            None
+        """
+        assert isinstance(source, GraphicsPage)
+        assert source.surface is not None, "Cannot paint a page which has already been closed"
+
+        scale: float = self.dots_per_metre / source.dots_per_metre
+
+        context: cairo.Context = cairo.Context(target=self.surface)
+        context.scale(sx=scale, sy=scale)
+        context.set_source_surface(surface=source.surface, x=0, y=0)
+        context.paint()
+
 
 class GraphicsContext:
     """
@@ -148,10 +449,26 @@ class GraphicsContext:
         self.base_line_width: float = line_width_base
         self.base_font_size: float = font_size_base
         self.font_size: Optional[float] = False
+        self.font_family: str = "FreeSerif"
         self.font_bold: bool = False
         self.font_italic: bool = False
         self.line_dotted: bool = False
 
+        # The graphics state most recently passed to cairo, so that we can skip calls which would not change it. None
+        # indicates that a setting is not known. This is saved and restored alongside cairo's own state.
+        self.cairo_state: Dict[str, Hashable] = {
+            'color': None,
+            'line_width': None,
+            'dash': None,
+            'font_face': None,
+            'font_size': None
+        }
+        self.cairo_state_stack: List[Dict[str, Hashable]] = []
+
+        # Count how many state changes we have passed to cairo, and how many we have skipped as redundant
+        self.state_changes: int = 0
+        self.state_changes_suppressed: int = 0
+
         # Create Cairo context with default settings for requested canvas
         self.context: cairo.Context = cairo.Context(target=page.surface)
         self.context.scale(sx=page.dots_per_metre, sy=page.dots_per_metre)
@@ -168,6 +485,51 @@ class GraphicsContext:
     def __exit__(self, err_type, err_value, err_tb):
         pass
 
+    def _change_state(self, setting: str, value: Hashable) -> bool:
+        """
+        Record a change to the graphics state, and report whether it differs from the state cairo already has.
+
+        :param setting:
+            The name of the setting to change
+        :param value:
+            The new value of the setting
+        :return:
+            Boolean flag indicating whether cairo needs to be told about the change
+        """
+        if self.cairo_state[setting] == value:
+            self.state_changes_suppressed += 1
+            return False
+        self.cairo_state[setting] = value
+        self.state_changes += 1
+        return True
+
+    def state_statistics(self) -> Dict[str, int]:
+        """
+        Report how many changes to the graphics state have been passed to cairo, and how many have been skipped
+        because they would not have changed anything.
+
+        :return:
+            Dictionary with the elements 'issued' and 'suppressed'
+        """
+        return {
+            'issued': self.state_changes,
+            'suppressed': self.state_changes_suppressed
+        }
+
+    def save(self) -> None:
+        """
+        Save the state of the cairo context, including the transformation matrix and the graphics state.
+        """
+        self.context.save()
+        self.cairo_state_stack.append(self.cairo_state.copy())
+
+    def restore(self) -> None:
+        """
+        Restore the state of the cairo context which was most recently saved.
+        """
+        self.context.restore()
+        self.cairo_state = self.cairo_state_stack.pop()
+
     def begin_path(self) -> None:
         """
         Begin a new path.
@@ -206,6 +568,105 @@ class GraphicsContext:
         """
         self.context.line_to(x=x, y=y)
 
+    def polyline(self, xs: np.ndarray, ys: np.ndarray, close: bool = False) -> None:
+        """
+        Add a polyline to the current path, as a new sub-path starting at its first vertex.
+
+        :param xs:
+            Array of the horizontal positions of the vertices, metres
+        :param ys:
+            Array of the vertical positions of the vertices, metres
+        :param close:
+            Boolean flag indicating whether to close the polyline into a polygon
+        :return:
+            None
+        """
+        self.polylines(lines=((xs, ys),), close=close)
+
+    def polylines(self, lines: Sequence[Tuple[np.ndarray, np.ndarray]], close: bool = False) -> None:
+        """
+        Add a sequence of polylines to the current path, each as a new sub-path, using a single call to cairo.
+
+        :param lines:
+            Sequence of (xs, ys) tuples, each containing arrays of the positions of the vertices of one polyline, metres
+        :param close:
+            Boolean flag indicating whether to close each polyline into a polygon
+        :return:
+            None
+        """
+        buffers: List[np.ndarray] = [encode_polyline_path(xs=xs, ys=ys, close=close)
+                                     for xs, ys in lines if len(xs) > 0]
+        if len(buffers) == 0:
+            return
+        self.append_path_data(data=np.concatenate(buffers))
+
+    def segments(self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> None:
+        """
+        Add a set of straight line segments to the current path, each as a new sub-path, using a single call to cairo.
+
+        :param x0:
+            Array of the horizontal positions of the start of each segment, metres
+        :param y0:
+            Array of the vertical positions of the start of each segment, metres
+        :param x1:
+            Array of the horizontal positions of the end of each segment, metres
+        :param y1:
+            Array of the vertical positions of the end of each segment, metres
+        :return:
+            None
+        """
+        if len(x0) == 0:
+            return
+        self.append_path_data(data=encode_segments_path(x0=x0, y0=y0, x1=x1, y1=y1))
+
+    def discs(self, xs: np.ndarray, ys: np.ndarray, radii: np.ndarray,
+              color: Optional[Sequence[float]] = None) -> None:
+        """
+        Draw a set of filled circles, as a single path which is filled once. This replaces the current path.
+
+        :param xs:
+            Array of the horizontal positions of the centres of the circles, metres
+        :param ys:
+            Array of the vertical positions of the centres of the circles, metres
+        :param radii:
+            Array of the radii of the circles, metres
+        :param color:
+            The color to fill the circles with
+        :return:
+            None
+        """
+        self.begin_path()
+        if len(xs) == 0:
+            return
+        self.append_path_data(data=encode_discs_path(xs=xs, ys=ys, radii=radii))
+
+        # Every circle winds in the same direction, so the non-zero winding rule fills overlapping discs solidly,
+        # where the even-odd rule used elsewhere would leave holes where they overlap
+        self.save()
+        self.context.set_fill_rule(fill_rule=cairo.FILL_RULE_WINDING)
+        self.fill(color=color)
+        self.restore()
+
+    def append_path_data(self, data: np.ndarray) -> None:
+        """
+        Append path elements, encoded as an array of cairo_path_data_t elements, to the current path.
+
+        :param data:
+            Array of float64 with shape (number of elements, 2), as returned by <encode_polyline_path>
+        :return:
+            None
+        """
+        data = np.ascontiguousarray(data, dtype=np.float64)
+
+        # Pass the encoded path straight to cairo; <data> must stay alive until cairo_append_path returns
+        path = cairo.ffi.new('cairo_path_t *', {
+            'status': cairo.STATUS_SUCCESS,
+            'data': cairo.ffi.cast('cairo_path_data_t *', cairo.ffi.from_buffer(data)),
+            'num_data': data.shape[0]
+        })
+        cairo.cairo.cairo_append_path(self.context._pointer, path)
+        self.context._check_status()
+
     def curve_to(self, x0: float, y0: float, x1: float, y1: float, x2: float, y2: float) -> None:
         """
         Bézier curve element
@@ -314,7 +775,9 @@ class GraphicsContext:
         :return:
             None
         """
-        self.context.set_source_rgba(red=color[0], green=color[1], blue=color[2], alpha=color[3])
+        color = tuple(color[:4])
+        if self._change_state(setting='color', value=color):
+            self.context.set_source_rgba(red=color[0], green=color[1], blue=color[2], alpha=color[3])
 
     def set_line_style(self, dotted: Optional[bool] = None) -> None:
         """
@@ -328,10 +791,11 @@ class GraphicsContext:
         if dotted is not None:
             self.line_dotted = dotted
 
-        if self.line_dotted:
-            self.context.set_dash([1.0 * unit_mm])
-        else:
-            self.context.set_dash([])
+        if self._change_state(setting='dash', value=self.line_dotted):
+            if self.line_dotted:
+                self.context.set_dash([1.0 * unit_mm])
+            else:
+                self.context.set_dash([])
 
     def set_font_size(self, font_size: float) -> None:
         """
@@ -341,7 +805,8 @@ class GraphicsContext:
             Font size, relative to default
         """
         self.font_size = font_size
-        self.context.set_font_size(font_size * self.base_font_size)
+        if self._change_state(setting='font_size', value=font_size * self.base_font_size):
+            self.context.set_font_size(font_size * self.base_font_size)
 
     def set_font_style(self, italic: Optional[bool] = None, bold: Optional[bool] = None) -> None:
         """
@@ -357,10 +822,12 @@ class GraphicsContext:
         if bold is not None:
             self.font_bold = bold
 
-        self.context.select_font_face(family="FreeSerif",
-                                      slant=cairo.FONT_SLANT_ITALIC if self.font_italic else cairo.FONT_SLANT_NORMAL,
-                                      weight=cairo.FONT_WEIGHT_BOLD if self.font_bold else cairo.FONT_SLANT_NORMAL
-                                      )
+        if self._change_state(setting='font_face', value=(self.font_family, self.font_italic, self.font_bold)):
+            self.context.select_font_face(
+                family=self.font_family,
+                slant=cairo.FONT_SLANT_ITALIC if self.font_italic else cairo.FONT_SLANT_NORMAL,
+                weight=cairo.FONT_WEIGHT_BOLD if self.font_bold else cairo.FONT_SLANT_NORMAL
+            )
 
     def set_line_width(self, line_width: float) -> None:
         """
@@ -371,7 +838,8 @@ class GraphicsContext:
         :return:
             None
         """
-        self.context.set_line_width(width=line_width * self.base_line_width)
+        if self._change_state(setting='line_width', value=line_width * self.base_line_width):
+            self.context.set_line_width(width=line_width * self.base_line_width)
 
     def text(self, text: str, x: float, y: float,
              h_align: int = 0, v_align: int = 0,
@@ -413,16 +881,17 @@ class GraphicsContext:
             offset_y += extent['height'] / 2
 
         # Now draw text
-        self.context.save()
+        self.save()
         self.context.translate(tx=x, ty=y)
         self.context.rotate(radians=rotation)
         self.context.move_to(x=offset_x + gap * h_align, y=offset_y + gap * v_align)
         self.context.show_text(text=text)
-        self.context.restore()
+        self.restore()
 
     def measure_text(self, text: str) -> Dict[str, float]:
         """
         Measure the dimensions of a string of text, as it would be rendered in the currently-selected font.
+        Measurements are cached, since the same strings are measured many times.
 
         :param text:
             Text string to render
@@ -430,8 +899,19 @@ class GraphicsContext:
             Dictionary of size information about the text string
         """
 
+        # Text dimensions depend on the font, and on the scaling and rotation of the transformation matrix, which
+        # affect font hinting. They do not depend on its translation, so text drawn at different positions shares
+        # the same cache entries.
+        xx, yx, xy, yy, x0, y0 = self.context.get_matrix().as_tuple()
+        key: Tuple = (self.font_family, self.font_bold, self.font_italic, self.font_size * self.base_font_size,
+                      (xx, yx, xy, yy), text)
+
         # Measure text
-        (x, y, width, height, dx, dy) = self.context.text_extents(text=text)
+        extents: Optional[Tuple[float, ...]] = text_extent_cache.lookup(key)
+        if extents is None:
+            extents = tuple(self.context.text_extents(text=text))
+            text_extent_cache.store(key, extents)
+        (x, y, width, height, dx, dy) = extents
 
         # Return dimensions
         return {
@@ -491,11 +971,72 @@ class GraphicsContext:
                       )
             current_azimuth += (character_width * spacing) / radius
 
+    def break_paragraph(self, text: str, width: float, minimum_raggedness: bool = False,
+                        kerning_correction: bool = True) -> List[str]:
+        """
+        Break a paragraph of text into lines no longer than a maximum width, in the currently-selected font. Each word,
+        and the space between words, is measured only once, and the lengths of lines are found by adding up the
+        widths of their words.
+
+        :param text:
+            The paragraph of text to break into lines
+        :param width:
+            The maximum allowed length of each line, metres
+        :param minimum_raggedness:
+            Boolean flag indicating whether to choose line breaks which make the lines as even in length as possible,
+            rather than filling each line in turn
+        :param kerning_correction:
+            Boolean flag indicating whether to measure each complete line when filling lines in turn, since kerning
+            and glyph overhangs mean that a line is not exactly the sum of its words. This only needs one or two
+            measurements per line.
+        :return:
+            List of lines of text
+        """
+        words: List[str] = text.split()
+        if len(words) == 0:
+            return [""]
+
+        word_widths: List[float] = [self.measure_text(word)['dx'] for word in words]
+        space_width: float = self.measure_text(" ")['dx']
+
+        # Choose line breaks to make the lines as even as possible
+        if minimum_raggedness:
+            breaks: List[int] = minimum_raggedness_breaks(word_widths=word_widths, space_width=space_width,
+                                                          width=width)
+            return [" ".join(words[start:end]) for start, end in zip(breaks, breaks[1:] + [len(words)])]
+
+        def line_fits(start: int, end: int) -> bool:
+            return self.measure_text(" ".join(words[start:end]))['width'] <= width
+
+        # Fill each line in turn with as many words as will fit
+        lines: List[str] = []
+        start: int = 0
+        while start < len(words):
+            # Add up the widths of the words to estimate where the line ends
+            end: int = start + 1
+            line_width: float = word_widths[start]
+            while end < len(words) and line_width + space_width + word_widths[end] <= width:
+                line_width += space_width + word_widths[end]
+                end += 1
+
+            # Measure the whole line to correct the estimated line end, by a word or two either way
+            if kerning_correction:
+                while end > start + 1 and not line_fits(start=start, end=end):
+                    end -= 1
+                while end < len(words) and line_fits(start=start, end=end + 1):
+                    end += 1
+
+            lines.append(" ".join(words[start:end]))
+            start = end
+
+        return lines
+
     def text_wrapped(self, text: Union[str, Sequence], x: float, y: float, width: float,
                      justify: int = 0, line_spacing: float = 1.3,
-                     h_align: int = 0, v_align: int = 0, rotation: float = 0) -> None:
+                     h_align: int = 0, v_align: int = 0, rotation: float = 0,
+                     minimum_raggedness: bool = False, kerning_correction: bool = True) -> float:
         """
-        Add a text string to the drawing canvas.
+        Add a text string to the drawing canvas, wrapping it onto multiple lines.
 
         :param text:
             The string to write
@@ -515,6 +1056,13 @@ class GraphicsContext:
             The vertical alignment of the string: -1 top; 0 centred; 1 bottom
         :param rotation:
             The rotation angle of the text, radians
+        :param minimum_raggedness:
+            Boolean flag indicating whether to choose line breaks which make the lines as even in length as possible,
+            rather than filling each line in turn
+        :param kerning_correction:
+            Boolean flag indicating whether to measure each complete line to correct for kerning between words
+        :return:
+            The total height of the text, metres
         """
 
         if not isinstance(text, (list, tuple)):
@@ -525,26 +1073,15 @@ class GraphicsContext:
 
         # Loop through each of the paragraphs of input text, one by one. They are supplied as a list or tuple.
         for paragraph in text:
-            line: str = ""
-            # Add each word in turn to the current line, until it becomes too long
-            for word in paragraph.split():
-                line_new = "{} {}".format(line, word).strip()
-                line_new_width = self.measure_text(line_new)['width']
-                # If the line is too long, start a new line
-                if line_new_width > width:
-                    line_buffer.append(line)
-                    line = word
-                # Otherwise, keep adding words to the existing line
-                else:
-                    line = line_new
-            # Add last line of text to buffer
-            line_buffer.append(line)
+            line_buffer.extend(self.break_paragraph(text=paragraph, width=width,
+                                                    minimum_raggedness=minimum_raggedness,
+                                                    kerning_correction=kerning_correction))
 
         line_heights: List[float] = [self.font_size * self.base_font_size * line_spacing for line in line_buffer]
         total_height: float = sum(line_heights)
 
         # Now draw text, line by line
-        self.context.save()
+        self.save()
         self.context.translate(tx=x, ty=y)
         self.context.rotate(radians=rotation)
 
@@ -562,7 +1099,9 @@ class GraphicsContext:
             self.text(text=line, x=x_anchor, y=y_anchor, h_align=justify, v_align=-1)
             y_anchor += line_heights[line_number]
 
-        self.context.restore()
+        self.restore()
+
+        return total_height
 
     def paint_png_image(self, png_filename: str, x_left: float, y_top: float,
                         target_width: float, target_height: float) -> bool:
@@ -584,7 +1123,7 @@ class GraphicsContext:
         """
 
         # Save the state of the display context
-        self.context.save()
+        self.save()
         try:
             # Create a Cairo image surface with the PNG image on it
             image_surface: cairo.ImageSurface = cairo.ImageSurface.create_from_png(png_filename)
@@ -609,7 +1148,7 @@ class GraphicsContext:
             outcome = False
 
         # Make sure that we undo the coordinate transformation, even if the image render fails
-        self.context.restore()
+        self.restore()
 
         # Return success flag
         return outcome
@@ -622,7 +1161,7 @@ class GraphicsContext:
         x_new = xx * x + xy * y + x0
         y_new = yx * x + yy * y + y0
         """
-        self.context.save()
+        self.save()
         self.context.translate(tx=centre_x, ty=centre_y)
         self.context.transform(cairo.Matrix(xx=xx, yx=yx, xy=xy, yy=yy, x0=x0, y0=y0))
 
@@ -630,7 +1169,7 @@ class GraphicsContext:
         """
         Undo a matrix transformation to the Cairo drawing context.
         """
-        self.context.restore()
+        self.restore()
 
 
 class BaseComponent:
@@ -707,7 +1246,8 @@ class BaseComponent:
                                 offset_x=-bounding_box['x_min'],
                                 offset_y=-bounding_box['y_min'])
 
-    def render_all_formats(self, filename: Optional[str] = None, dots_per_inch: float = dots_per_inch) -> None:
+    def render_all_formats(self, filename: Optional[str] = None, dots_per_inch: float = dots_per_inch,
+                           replay: bool = True, img_formats: Optional[Sequence[str]] = None) -> None:
         """
         Quick shortcut to render this component in all the standard image formats.
 
@@ -717,16 +1257,50 @@ class BaseComponent:
             The dots per inch resolution to render this page
         :type dots_per_inch:
             float
+        :param replay:
+            If true, render this component only once, onto a cairo recording surface, and then replay the recording
+            onto each image format. If false, render this component from scratch for each image format.
+        :param img_formats:
+            The image formats to produce. If None, all supported formats are produced.
         :return:
             None
         """
 
-        # Produce each image format in turn
-        for img_format in GraphicsPage.supported_formats():
-            # Render the item
-            self.render_to_file(filename=filename,
-                                img_format=img_format,
-                                dots_per_inch=dots_per_inch)
+        if img_formats is None:
+            img_formats = GraphicsPage.supported_formats()
+
+        if len(img_formats) == 0:
+            return
+
+        if not replay:
+            # Produce each image format in turn
+            for img_format in img_formats:
+                # Render the item
+                self.render_to_file(filename=filename,
+                                    img_format=img_format,
+                                    dots_per_inch=dots_per_inch)
+            return
+
+        # Look up the bounding box of the item we're about to draw
+        bounding_box: Dict[str, float] = self.bounding_box(settings=self.settings)
+        width: float = bounding_box['x_max'] - bounding_box['x_min']
+        height: float = bounding_box['y_max'] - bounding_box['y_min']
+
+        # If no filename is specified, then individual derived classes should specify a default
+        if filename is None:
+            filename = self.default_filename()
+
+        # Render the item once, onto a recording surface
+        with GraphicsPage(img_format="recording", output=filename, width=width, height=height) as recording:
+            self.render_to_page(page=recording,
+                                offset_x=-bounding_box['x_min'],
+                                offset_y=-bounding_box['y_min'])
+
+            # Replay the recording onto each image format in turn
+            for img_format in img_formats:
+                with GraphicsPage(img_format=img_format, output=filename, width=width, height=height,
+                                  dots_per_inch=dots_per_inch) as page:
+                    page.paint_page(source=recording)
 
     def bounding_box(self, settings: dict) -> Dict[str, float]:
         """
@@ -751,6 +1325,18 @@ class BaseComponent:
                                   "<default_filename> which report a default filename to use for this item, without "
                                   "file type suffix.")
 
+    def data_files(self, settings: dict) -> List[str]:
+        """
+        Report the data files which this item reads when it is rendered, so that its outputs can be rebuilt when they
+        change. Items which draw nothing from data files need not override this method.
+
+        :param settings:
+            A dictionary of settings required by the renderer.
+        :return:
+            List of filenames
+        """
+        return []
+
     def do_rendering(self, settings: dict, context: GraphicsContext) -> None:
         """
         This method is required to actually render this item.
@@ -796,6 +1382,16 @@ class CompositeComponent(BaseComponent):
             'y_max': max([item['y_max'] for item in bounding_boxes]),
         }
 
+    def data_files(self, settings: dict) -> List[str]:
+        """
+        Report the data files read by any of the constituent components.
+
+        :param settings:
+            A dictionary of settings required by the renderer.
+        """
+
+        return sorted(set(filename for item in self.components for filename in item.data_files(settings=item.settings)))
+
     def do_rendering(self, settings: dict, context: GraphicsContext) -> None:
         """
         Render each of the subcomponents we are overlaying in turn.
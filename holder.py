@@ -22,18 +22,36 @@
 Render the holder for the precession planisphere.
 """
 
+from functools import lru_cache
 from math import pi, sin, cos, atan2, asin, hypot
-from numpy import arange
-from typing import Dict, List, Tuple
+from numpy import arange, ndarray
+from typing import Dict, Tuple
 
-from constants import radius, transform, pos
-from constants import unit_deg, unit_rev, unit_cm, unit_mm, inclination_ecliptic, r_1, r_2, fold_gap, central_hole_size, \
+from constants import horizon_label_position, project_array
+from constants import unit_rev, unit_cm, unit_mm, inclination_ecliptic, r_1, r_2, fold_gap, central_hole_size, \
     line_width_base
 from graphics_context import BaseComponent, GraphicsContext
+from precession import precession_angle
 from settings import fetch_command_line_arguments
 from text import text
 
 
+@lru_cache(maxsize=None)
+def horizon_outline(latitude: float) -> Tuple[ndarray, ndarray]:
+    """
+    Trace the horizon of the viewing window, which is the same for both hemispheres, and so is cached.
+
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :return:
+        Tuple of arrays (x, y), metres
+    """
+    x, y = project_array(alt=0, az=arange(0, 360.5, 1), latitude=latitude)
+    x.setflags(write=False)
+    y.setflags(write=False)
+    return x, y
+
+
 class Holder(BaseComponent):
     """
     Render the holder for the precession planisphere.
@@ -79,6 +97,7 @@ class Holder(BaseComponent):
         is_southern: bool = settings['southern']
         latitude: float = 90 - inclination_ecliptic
         language: str = settings['language']
+        cut_out: bool = settings.get('cut_out', False)
 
         context.set_font_size(0.9)
 
@@ -111,42 +130,41 @@ class Holder(BaseComponent):
 
         # Shade the viewing window which needs to be cut out
         x0: Tuple[float, float] = (0, h)
+        x, y = horizon_outline(latitude=latitude)
+        if cut_out:
+            # Show the assembled planisphere, with the front of the body opaque, and the viewing window cut out of it
+            context.begin_path()
+            context.arc(centre_x=0, centre_y=-h, radius=r_2, arc_from=-theta - pi / 2, arc_to=theta - pi / 2)
+            context.line_to(x=r_1, y=-a)
+            context.line_to(x=r_1, y=0)
+            context.line_to(x=-r_1, y=0)
+            context.line_to(x=-r_1, y=-a)
+            context.close_path()
+            context.polyline(xs=x0[0] + x, ys=-x0[1] + y, close=True)
+            context.fill(color=(1, 1, 1, 1))
+            context.set_color(color=(0, 0, 0, 1))
+
         context.begin_path()
-        i: int
-        az: float
-        for i, az in enumerate(arange(0, 360.5, 1)):
-            pp: Tuple[float, float] = transform(alt=0, az=az, latitude=latitude)
-            r: float = radius(dec=pp[1] / unit_deg, latitude=latitude)
-            p: Dict[str, float] = pos(r=r, t=pp[0])
-            if i == 0:
-                context.move_to(x0[0] + p['x'], -x0[1] + p['y'])
-            else:
-                context.line_to(x0[0] + p['x'], -x0[1] + p['y'])
+        context.polyline(xs=x0[0] + x, ys=-x0[1] + y)
         context.stroke()
-        context.fill(color=(0, 0, 0, 0.2))
 
-        # Display instructions for cutting out the viewing window
-        instructions: str = text[language]["cut_out_instructions"]
-        context.set_color(color=(0, 0, 0, 1))
-        context.text_wrapped(text=instructions,
-                             width=4 * unit_cm, justify=0,
-                             x=0, y=-h - r_1 * 0.35,
-                             h_align=0, v_align=0, rotation=0)
+        if not cut_out:
+            context.fill(color=(0, 0, 0, 0.2))
+
+            # Display instructions for cutting out the viewing window
+            instructions: str = text[language]["cut_out_instructions"]
+            context.set_color(color=(0, 0, 0, 1))
+            context.text_wrapped(text=instructions,
+                                 width=4 * unit_cm, justify=0,
+                                 x=0, y=-h - r_1 * 0.35,
+                                 h_align=0, v_align=0, rotation=0)
 
         # Cardinal points
         def cardinal(dir: str, ang: float) -> None:
-            pp: Tuple[float, float] = transform(alt=0, az=ang - 0.01, latitude=latitude)
-            r: float = radius(dec=pp[1] / unit_deg, latitude=latitude)
-            p: Dict[str, float] = pos(r, pp[0])
-
-            pp2: Tuple[float, float] = transform(alt=0, az=ang + 0.01, latitude=latitude)
-            r2: float = radius(dec=pp2[1] / unit_deg, latitude=latitude)
-            p2: Dict[str, float] = pos(r=r2, t=pp2[0])
+            # The horizon is the same for both hemispheres, so labels at the same azimuth share a cached position
+            x, y, tr = horizon_label_position(azimuth=ang % 360, latitude=latitude)
 
-            p3: List[float] = [p2[i] - p[i] for i in ('x', 'y')]
-            tr: float = -unit_rev / 4 - atan2(p3[0], p3[1])
-
-            context.text(text=dir, x=x0[0] + p['x'], y=-x0[1] + p['y'],
+            context.text(text=dir, x=x0[0] + x, y=-x0[1] + y,
                          h_align=0, v_align=1, gap=unit_mm, rotation=tr)
 
         # Write the cardinal points around the horizon of the viewing window
@@ -159,9 +177,17 @@ class Holder(BaseComponent):
 
         context.set_font_style(bold=False)
 
-        # Clock face, which lines up with the date scale on the star wheel
-        theta: float = unit_rev / 25772 * 6000  # Cover 6000 years on either side of J2000
-        dash: float = unit_rev / 25772 * 500  # Draw fat dashes at 500 minute intervals
+        # Year scale, which lines up with the arrow on the star wheel. The angle of each year is given by the
+        # long-term precession model, evaluated for all the years we mark in a single call.
+        direction: int = -1 if is_southern else 1
+        dash_years: ndarray = arange(-4000, 8001, 500)  # Draw fat dashes at 500 year intervals
+        dash_angles: ndarray = precession_angle(epoch=dash_years) * direction
+        label_years: ndarray = arange(-4000, 8000, 1000)
+        label_angles: ndarray = precession_angle(epoch=label_years) * direction
+
+        # Cover 6000 years on either side of J2000
+        theta_min: float = float(min(dash_angles[0], dash_angles[-1]))
+        theta_max: float = float(max(dash_angles[0], dash_angles[-1]))
 
         # Outer edge of dashed scale
         r_3: float = r_2 - 2 * unit_mm
@@ -177,21 +203,22 @@ class Holder(BaseComponent):
 
         # Inner and outer curves around dashed scale
         context.begin_path()
-        context.arc(centre_x=0, centre_y=-h, radius=r_3, arc_from=-theta - pi / 2, arc_to=theta - pi / 2)
+        context.arc(centre_x=0, centre_y=-h, radius=r_3, arc_from=theta_min - pi / 2, arc_to=theta_max - pi / 2)
         context.begin_sub_path()
-        context.arc(centre_x=0, centre_y=-h, radius=r_4, arc_from=-theta - pi / 2, arc_to=theta - pi / 2)
+        context.arc(centre_x=0, centre_y=-h, radius=r_4, arc_from=theta_min - pi / 2, arc_to=theta_max - pi / 2)
         context.stroke()
 
         # Draw a fat dashed line with one dash every 500 years
-        for i in arange(-theta, theta, 2 * dash):
+        for i in range(0, len(dash_years) - 1, 2):
+            t_from: float = float(min(dash_angles[i], dash_angles[i + 1]))
+            t_to: float = float(max(dash_angles[i], dash_angles[i + 1]))
             context.begin_path()
-            context.arc(centre_x=0, centre_y=-h, radius=(r_3 + r_4) / 2, arc_from=i - pi / 2, arc_to=i + dash - pi / 2)
+            context.arc(centre_x=0, centre_y=-h, radius=(r_3 + r_4) / 2, arc_from=t_from - pi / 2, arc_to=t_to - pi / 2)
             context.stroke(line_width=(r_3 - r_4) / line_width_base)
 
         # Write the years
-        for year in arange(-4000, 8000, 1000):
+        for year, t in zip(label_years, label_angles):
             txt: str = "{:d}{}".format(abs(year), "CE" if (year >= 0) else "BCE")
-            t: float = unit_rev / 25772 * (year - 2000) * (-1 if is_southern else 1)
 
             # Stroke a dash and write the number of the hour
             context.begin_path()
@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+# kit_assembler.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Assemble a multi-page PDF document containing all the parts needed to build a precession planisphere, together with
+instructions as to how to put them together. This draws every page directly with cairo, as an alternative to
+building the document with LaTeX.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from constants import unit_cm, unit_mm
+from graphics_context import BaseComponent, GraphicsContext, GraphicsPage
+from holder import Holder
+from ra_dec import RaDecGrid
+from settings import fetch_command_line_arguments
+from starwheel import StarWheel
+from text import text
+
+# Dimensions of an A4 page
+page_width: float = 21.0 * unit_cm
+page_height: float = 29.7 * unit_cm
+
+# Margins around the text on each page
+page_margin: float = 2.0 * unit_cm
+
+
+class InstructionsPage(BaseComponent):
+    """
+    Render one page of the instructions at the front of the planisphere kit.
+    """
+
+    def default_filename(self) -> str:
+        """
+        Return the default filename to use when saving this component.
+        """
+        return "instructions"
+
+    def bounding_box(self, settings: dict) -> Dict[str, float]:
+        """
+        Return the bounding box of the canvas area used by this component.
+
+        :param settings:
+            A dictionary of settings required by the renderer.
+        :return:
+         Dictionary with the elements 'x_min', 'x_max', 'y_min' and 'y_max' set
+        """
+        return {
+            'x_min': 0,
+            'x_max': page_width,
+            'y_min': 0,
+            'y_max': page_height
+        }
+
+    def do_rendering(self, settings: dict, context: GraphicsContext) -> None:
+        """
+        This method is required to actually render this item.
+
+        :param settings:
+            A dictionary of settings required by the renderer.
+        :param context:
+            A GraphicsContext object to use for drawing
+        :return:
+            None
+        """
+
+        language: str = settings['language']
+        page_number: int = settings['page']
+        substitutions: Dict[str, str] = {
+            'ns_full': 'southern' if settings['southern'] else 'northern'
+        }
+
+        text_width: float = page_width - 2 * page_margin
+        x_centre: float = page_width / 2
+        y: float = page_margin
+
+        context.set_color(color=(0, 0, 0, 1))
+
+        # The first page starts with the title of the document
+        if page_number == 0:
+            context.set_font_size(2.2)
+            context.set_font_style(bold=True)
+            y += context.text_wrapped(text=text[language]['kit_title'], x=x_centre, y=y, width=text_width,
+                                      justify=0, h_align=0, v_align=1)
+            context.set_font_style(bold=False)
+            context.set_font_size(1.4)
+            y += context.text_wrapped(text=text[language]['kit_author'], x=x_centre, y=y, width=text_width,
+                                      justify=0, h_align=0, v_align=1)
+            y += 5 * unit_mm
+
+        # Indentation of bulleted list items
+        indent: float = 5 * unit_mm
+
+        style: str
+        block: str
+        for style, block in text[language]['kit_instructions'][page_number]:
+            block = block.format(**substitutions)
+
+            if style == "h":
+                y += 3 * unit_mm
+                context.set_font_size(1.5)
+                context.set_font_style(bold=True)
+                y += context.text_wrapped(text=block, x=x_centre, y=y, width=text_width,
+                                          justify=-1, h_align=0, v_align=1)
+                context.set_font_style(bold=False)
+            elif style == "li":
+                context.set_font_size(1.2)
+                context.text(text="\u2022", x=page_margin + indent / 2, y=y, h_align=0, v_align=-1)
+                y += context.text_wrapped(text=block, x=x_centre + indent / 2, y=y, width=text_width - indent,
+                                          justify=-1, h_align=0, v_align=1)
+            else:
+                context.set_font_size(1.2)
+                context.set_font_style(bold=(style == "b"))
+                y += context.text_wrapped(text=block, x=x_centre, y=y, width=text_width,
+                                          justify=-1, h_align=0, v_align=1)
+                context.set_font_style(bold=False)
+                y += 2 * unit_mm
+
+
+def draw_page_furniture(page: GraphicsPage, language: str, page_number: int,
+                        caption: Optional[str] = None) -> None:
+    """
+    Draw the header and footer around a page of the planisphere kit, and optionally a caption at the bottom of the
+    page.
+
+    :param page:
+        The GraphicsPage we are going to draw onto
+    :param language:
+        The language to write the text in
+    :param page_number:
+        The number of this page, counting from one
+    :param caption:
+        Optional caption to write below the component drawn on this page
+    :return:
+        None
+    """
+    text_width: float = page_width - 2 * page_margin
+
+    with GraphicsContext(page=page) as context:
+        context.set_color(color=(0, 0, 0, 1))
+
+        # Header
+        context.set_font_size(0.9)
+        context.set_font_style(italic=True)
+        context.text(text=text[language]['kit_header'], x=page_margin, y=page_margin / 2, h_align=-1, v_align=0)
+        context.set_font_style(italic=False)
+        context.text(text="{:d}".format(page_number), x=page_width - page_margin, y=page_margin / 2,
+                     h_align=1, v_align=0)
+
+        # Footer
+        context.set_font_size(0.7)
+        context.set_font_style(bold=True)
+        context.text_wrapped(text=text[language]['kit_footer'], x=page_width / 2, y=page_height - page_margin / 2,
+                             width=text_width, justify=0, h_align=0, v_align=0)
+        context.set_font_style(bold=False)
+
+        # Caption
+        if caption is not None:
+            context.set_font_size(1.2)
+            context.text_wrapped(text=caption, x=page_width / 2, y=page_height - 1.5 * page_margin,
+                                 width=text_width, justify=-1, h_align=0, v_align=-1)
+
+
+def assemble_kit(filename: str, settings: dict) -> None:
+    """
+    Build a multi-page PDF document containing instructions, followed by the star wheel, holder and ra-dec grid
+    components of the planisphere, each centred on its own A4 page.
+
+    :param filename:
+        The filename of the PDF file to create (without file type suffix)
+    :param settings:
+        The settings used to render each component
+    :return:
+        None
+    """
+    language: str = settings['language']
+
+    # List of the components to draw, one per page, and the caption to write beneath each
+    pages: List[Tuple[BaseComponent, Optional[str]]] = []
+    for page_number in range(len(text[language]['kit_instructions'])):
+        pages.append((InstructionsPage(settings={**settings, 'page': page_number}), None))
+    pages.append((StarWheel(settings=settings), text[language]['kit_caption_starwheel']))
+    pages.append((Holder(settings=settings), None))
+    pages.append((RaDecGrid(settings=settings), text[language]['kit_caption_ra_dec']))
+
+    with GraphicsPage(img_format="pdf", output=filename, width=page_width, height=page_height) as page:
+        for index, (component, caption) in enumerate(pages):
+            if index > 0:
+                page.new_page()
+
+            # Centre each component on its page
+            bounding_box: Dict[str, float] = component.bounding_box(settings=component.settings)
+            component.render_to_page(page=page,
+                                     offset_x=(page_width - bounding_box['x_max'] - bounding_box['x_min']) / 2,
+                                     offset_y=(page_height - bounding_box['y_max'] - bounding_box['y_min']) / 2)
+
+            draw_page_furniture(page=page, language=language, page_number=index + 1, caption=caption)
+
+
+# Do it right away if we're run as a script
+if __name__ == "__main__":
+    # Fetch command line arguments passed to us
+    arguments = fetch_command_line_arguments(default_filename="planisphere")
+
+    # Assemble the planisphere kit
+    assemble_kit(filename=arguments['filename'], settings={
+        'southern': False,
+        'language': 'en',
+        'theme': arguments['theme'],
+        'magnitude_limit': arguments['magnitude_limit'],
+        'star_catalog': arguments['star_catalog'],
+        'catalog_layout': arguments['catalog_layout'],
+        'epoch': arguments['epoch']
+    })
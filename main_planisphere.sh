@@ -18,9 +18,10 @@
 
 # ----------------------------------------------------------------------------
 
-# Delete any previous output from running this script
-rm -Rf __pycache__ *.pyc output
-rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/tmp doc/*.out
+# Delete temporary files from any previous run of this script. Previous output is kept, and is only rebuilt if its
+# inputs have changed; pass --force to rebuild everything.
+rm -Rf __pycache__ *.pyc
+rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/tmp doc/tmp_* doc/*.out
 
 # Run the python 3 script which generates precession planisphere models for
 # both northern and southern skies
@@ -28,4 +29,4 @@ python3 planisphere.py $@
 
 # Clean up temporary files which get made along the way
 rm -Rf __pycache__ *.pyc
-rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/tmp doc/*.out
+rm -Rf doc/*.aux doc/*.dvi doc/*.log doc/*.pdf doc/*.ps doc/tmp doc/tmp_* doc/*.out
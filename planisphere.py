@@ -29,85 +29,301 @@ which includes all the parts needed to build a planisphere for that
 hemisphere, and instructions as to how to put them together.
 """
 
+import inspect
 import os
 import subprocess
-import time
 
-from typing import Dict, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 
 import text
+from bright_stars_process import fetch_star_table
+from build_manifest import BuildManifest, component_input_hash, hash_files
+from constants import dots_per_inch, star_magnitude_limit
+from graphics_context import BaseComponent, GraphicsPage
+from proper_motion import catalog_epoch
 from ra_dec import RaDecGrid
 from holder import Holder
+from kit_assembler import InstructionsPage, assemble_kit
 from settings import fetch_command_line_arguments
 from starwheel import StarWheel
 
-# Create output directory
-os.system("rm -Rf output")
-os.system("mkdir -p output/planispheres output/planisphere_parts")
-
-arguments: Dict[str, Union[int, str]] = fetch_command_line_arguments()
-theme: str = arguments['theme']
-
-# Render planisphere in all available languages
-language: str
-for language in text.text:
-
-    # Render climates for both northern and southern hemispheres
-    southern: bool
-    for southern in [False, True]:
-
-        # A dictionary of common substitutions
-        subs: Dict[str, Union[str, float]] = {
-            'dir_parts': 'output/planisphere_parts',
-            'dir_out': 'output/planispheres',
-            'ns': "S" if southern else "N",
-            'ns_full': 'southern' if southern else 'northern',
-            'lang': language,
-        }
-
-        settings: Dict[str, Union[str, bool]] = {
-            'language': language,
-            'southern': southern,
-            'theme': theme
-        }
-
-        # Render the various parts of the planisphere
-        StarWheel(settings=settings).render_all_formats(
-            filename="{dir_parts}/starwheel_{ns}_{lang}".format(**subs)
-        )
-
-        Holder(settings=settings).render_all_formats(
-            filename="{dir_parts}/holder_{ns}_{lang}".format(**subs)
-        )
-
-        RaDecGrid(settings=settings).render_all_formats(
-            filename="{dir_parts}/ra_dec_grid_{ns}_{lang}".format(**subs)
-        )
-
-        # Copy the PDF versions of the components of this astrolabe into LaTeX's working directory, to produce a
-        # PDF file containing all the parts of this astrolabe
-        os.system("mkdir -p doc/tmp")
-        os.system("cp {dir_parts}/starwheel_{ns}_{lang}.pdf doc/tmp/starwheel.pdf".format(**subs))
-        os.system("cp {dir_parts}/holder_{ns}_{lang}.pdf doc/tmp/holder.pdf".format(**subs))
-        os.system("cp {dir_parts}/ra_dec_grid_{ns}_{lang}.pdf doc/tmp/ra_dec.pdf".format(**subs))
-
-        with open("doc/tmp/lat.tex", "wt") as f:
-            f.write(r"{ns_full}".format(**subs))
-
-        # Wait for cairo to wake up and close the files
-        time.sleep(1)
-
-        # Build LaTeX documentation
-        for build_pass in range(3):
-            subprocess.check_output("cd doc ; pdflatex planisphere.tex".format(**subs), shell=True)
-
-        os.system("mv doc/planisphere.pdf "
-                  "{dir_out}/planisphere_{ns}_{lang}.pdf".format(**subs))
-
-        # For the English language planisphere, create a symlink with no language suffix in the filename
-        if language == "en":
-            os.system("ln -s planisphere_{ns}_en.pdf "
-                      "{dir_out}/planisphere_{ns}.pdf".format(**subs))
-
-        # Clean up the rubbish that LaTeX leaves behind
-        os.system("cd doc ; rm -f *.aux *.log *.dvi *.ps *.pdf")
+
+def run_latex(working_directory: str, document: str, max_passes: int = 5) -> int:
+    """
+    Run pdflatex over a document, repeating only while the .aux file it writes is still changing.
+
+    :param working_directory:
+        The directory containing the LaTeX document
+    :param document:
+        The name of the LaTeX document, without the .tex suffix
+    :param max_passes:
+        The maximum number of times to run pdflatex
+    :return:
+        The number of times pdflatex was run
+    """
+    aux_filename: str = os.path.join(working_directory, "{}.aux".format(document))
+
+    def read_aux() -> Optional[bytes]:
+        try:
+            with open(aux_filename, "rb") as f_in:
+                return f_in.read()
+        except FileNotFoundError:
+            return None
+
+    aux_before: Optional[bytes] = read_aux()
+
+    build_pass: int = 0
+    while build_pass < max_passes:
+        subprocess.check_output("cd {} ; pdflatex {}.tex".format(working_directory, document), shell=True)
+        build_pass += 1
+        aux_after: Optional[bytes] = read_aux()
+
+        # Stop once the .aux file is stable. On the first pass there is no previous .aux file; if the new one records
+        # nothing beyond \relax, nothing in the document depends on it.
+        if aux_after == aux_before:
+            break
+        if aux_before is None and (aux_after is None or aux_after.strip() in (b"", b"\\relax")):
+            break
+        aux_before = aux_after
+
+    return build_pass
+
+
+def render_component(component: BaseComponent, filename: str, manifest: BuildManifest, force: bool = False) -> None:
+    """
+    Render a component in all the standard image formats, skipping any formats whose output file was built from
+    inputs identical to those we have now.
+
+    :param component:
+        The component to render
+    :param filename:
+        The filename of the image files to create (without file type stub)
+    :param manifest:
+        The build manifest recording the inputs used to build each output file
+    :param force:
+        If true, render all formats regardless of the manifest
+    :return:
+        None
+    """
+    input_hashes: Dict[str, str] = {
+        img_format: component_input_hash(component=component, img_format=img_format, dots_per_inch=dots_per_inch)
+        for img_format in GraphicsPage.supported_formats()
+    }
+
+    stale_formats: List[str] = [
+        img_format for img_format, input_hash in input_hashes.items()
+        if force or not manifest.is_up_to_date(output="{}.{}".format(filename, img_format), input_hash=input_hash)
+    ]
+
+    component.render_all_formats(filename=filename, img_formats=stale_formats)
+
+    for img_format in stale_formats:
+        manifest.record(output="{}.{}".format(filename, img_format), input_hash=input_hashes[img_format])
+
+
+def build_planisphere(language: str, southern: bool, theme: str, force: bool = False, backend: str = "latex",
+                      magnitude_limit: float = star_magnitude_limit, star_catalog: Optional[str] = None,
+                      catalog_layout: str = "bsc", epoch: float = catalog_epoch) -> None:
+    """
+    Render all the parts of the planisphere for one language, hemisphere and theme, and build a summary document
+    containing them. Each call uses its own LaTeX working directory, so that several calls may run in parallel.
+
+    Outputs are only rebuilt if their inputs have changed since they were last built.
+
+    :param language:
+        The language to render the planisphere in
+    :param southern:
+        Boolean flag indicating whether to render the southern hemisphere planisphere
+    :param theme:
+        The color theme to use
+    :param force:
+        If true, rebuild all outputs, even if their inputs have not changed
+    :param backend:
+        The tool used to build the summary document: "latex" to use pdflatex, or "native" to draw it with cairo
+    :param magnitude_limit:
+        The faintest magnitude of star to show on the star wheel
+    :param star_catalog:
+        The filename of a star catalogue to draw the star wheel from, or None to use the Yale Bright Star Catalogue
+    :param catalog_layout:
+        The name of the layout of the columns in <star_catalog>
+    :param epoch:
+        The epoch at which to show the positions of the stars on the star wheel, allowing for their proper motions
+    :return:
+        None
+    """
+    manifest: BuildManifest = BuildManifest()
+
+    # A dictionary of common substitutions
+    subs: Dict[str, Union[str, float]] = {
+        'dir_parts': 'output/planisphere_parts',
+        'dir_out': 'output/planispheres',
+        'ns': "S" if southern else "N",
+        'ns_full': 'southern' if southern else 'northern',
+        'lang': language,
+        'theme': theme
+    }
+
+    # LaTeX's working directory for this job
+    subs['dir_doc'] = "doc/tmp_{ns}_{lang}_{theme}".format(**subs)
+
+    settings: Dict[str, Union[str, bool, float]] = {
+        'language': language,
+        'southern': southern,
+        'theme': theme,
+        'magnitude_limit': magnitude_limit
+    }
+    if star_catalog is not None:
+        settings['star_catalog'] = star_catalog
+        settings['catalog_layout'] = catalog_layout
+    if epoch != catalog_epoch:
+        settings['epoch'] = epoch
+
+    # Render the various parts of the planisphere
+    render_component(component=StarWheel(settings=settings),
+                     filename="{dir_parts}/starwheel_{ns}_{lang}_{theme}".format(**subs),
+                     manifest=manifest, force=force)
+
+    render_component(component=Holder(settings=settings),
+                     filename="{dir_parts}/holder_{ns}_{lang}_{theme}".format(**subs),
+                     manifest=manifest, force=force)
+
+    render_component(component=RaDecGrid(settings=settings),
+                     filename="{dir_parts}/ra_dec_grid_{ns}_{lang}_{theme}".format(**subs),
+                     manifest=manifest, force=force)
+
+    document: str = "{dir_out}/planisphere_{ns}_{lang}_{theme}.pdf".format(**subs)
+
+    if backend == "native":
+        build_document_native(document=document, settings=settings, manifest=manifest, force=force)
+    else:
+        build_document_latex(document=document, subs=subs, manifest=manifest, force=force)
+
+    # For the English language planisphere in the default theme, create a symlink with no language or theme suffix in
+    # the filename
+    if language == "en" and theme == "default":
+        os.system("ln -sf planisphere_{ns}_en_default.pdf "
+                  "{dir_out}/planisphere_{ns}.pdf".format(**subs))
+
+
+def build_document_native(document: str, settings: dict, manifest: BuildManifest, force: bool = False) -> None:
+    """
+    Build the summary document for a planisphere by drawing all of its pages directly onto a multi-page PDF
+    surface, without using LaTeX.
+
+    :param document:
+        The filename of the PDF document to create
+    :param settings:
+        The settings used to render each component of the planisphere
+    :param manifest:
+        The build manifest recording the inputs used to build each output file
+    :param force:
+        If true, rebuild the document even if its inputs have not changed
+    :return:
+        None
+    """
+    # The summary document depends on the inputs to each of the components drawn on its pages
+    component_hashes: List[str] = [
+        component_input_hash(component=component, img_format="pdf", dots_per_inch=dots_per_inch)
+        for component in (InstructionsPage(settings=settings), StarWheel(settings=settings),
+                          Holder(settings=settings), RaDecGrid(settings=settings))
+    ]
+    document_hash: str = hash_files(filenames=[inspect.getsourcefile(InstructionsPage)],
+                                    prefix=" ".join(component_hashes).encode('utf-8'))
+
+    if not force and manifest.is_up_to_date(output=document, input_hash=document_hash):
+        return
+
+    assemble_kit(filename=os.path.splitext(document)[0], settings=settings)
+    manifest.record(output=document, input_hash=document_hash)
+
+
+def build_document_latex(document: str, subs: Dict[str, Union[str, float]], manifest: BuildManifest,
+                         force: bool = False) -> None:
+    """
+    Build the summary document for a planisphere by running LaTeX over <doc/planisphere.tex>, with the PDF versions
+    of the components of the planisphere copied into LaTeX's working directory.
+
+    :param document:
+        The filename of the PDF document to create
+    :param subs:
+        Dictionary of substitutions describing the planisphere we are building
+    :param manifest:
+        The build manifest recording the inputs used to build each output file
+    :param force:
+        If true, rebuild the document even if its inputs have not changed
+    :return:
+        None
+    """
+    # The summary document depends on the LaTeX source and the PDF versions of the components
+    document_hash: str = hash_files(filenames=["doc/planisphere.tex",
+                                               "{dir_parts}/starwheel_{ns}_{lang}_{theme}.pdf".format(**subs),
+                                               "{dir_parts}/holder_{ns}_{lang}_{theme}.pdf".format(**subs),
+                                               "{dir_parts}/ra_dec_grid_{ns}_{lang}_{theme}.pdf".format(**subs)],
+                                    prefix="{ns_full}".format(**subs).encode('utf-8'))
+
+    if not force and manifest.is_up_to_date(output=document, input_hash=document_hash):
+        return
+
+    # Copy the PDF versions of the components of this astrolabe into LaTeX's working directory, to produce a
+    # PDF file containing all the parts of this astrolabe
+    os.system("rm -Rf {dir_doc}".format(**subs))
+    os.system("mkdir -p {dir_doc}/tmp".format(**subs))
+    os.system("cp doc/planisphere.tex {dir_doc}/".format(**subs))
+    os.system("cp {dir_parts}/starwheel_{ns}_{lang}_{theme}.pdf {dir_doc}/tmp/starwheel.pdf".format(**subs))
+    os.system("cp {dir_parts}/holder_{ns}_{lang}_{theme}.pdf {dir_doc}/tmp/holder.pdf".format(**subs))
+    os.system("cp {dir_parts}/ra_dec_grid_{ns}_{lang}_{theme}.pdf {dir_doc}/tmp/ra_dec.pdf".format(**subs))
+
+    with open("{dir_doc}/tmp/lat.tex".format(**subs), "wt") as f:
+        f.write(r"{ns_full}".format(**subs))
+
+    # Build LaTeX documentation. The component files are already complete, since each GraphicsPage finishes its
+    # cairo surface when its <with> block exits.
+    run_latex(working_directory=subs['dir_doc'], document="planisphere")
+
+    os.system("mv {dir_doc}/planisphere.pdf {document}".format(document=document, **subs))
+    manifest.record(output=document, input_hash=document_hash)
+
+    # Clean up the rubbish that LaTeX leaves behind
+    os.system("rm -Rf {dir_doc}".format(**subs))
+
+
+# Do it right away if we're run as a script
+if __name__ == "__main__":
+    arguments: Dict[str, Union[int, str]] = fetch_command_line_arguments()
+    themes: List[str] = arguments['themes']
+    jobs: int = arguments['jobs']
+    force: bool = arguments['force']
+    backend: str = arguments['backend']
+    magnitude_limit: float = arguments['magnitude_limit']
+    star_catalog: Optional[str] = arguments['star_catalog']
+    catalog_layout: str = arguments['catalog_layout']
+    epoch: float = arguments['epoch']
+
+    # Create output directory. Previous output is kept, and only rebuilt if its inputs have changed.
+    os.system("mkdir -p output/planispheres output/planisphere_parts")
+
+    # Render planisphere in all available languages and in each of the requested themes, for both northern and
+    # southern hemispheres
+    build_jobs: List[Tuple[str, bool, str, bool, str, float, Optional[str], str, float]] = [
+        (language, southern, theme, force, backend, magnitude_limit, star_catalog, catalog_layout, epoch)
+        for language in text.text
+        for southern in [False, True]
+        for theme in themes
+    ]
+
+    # Make sure that a processed binary copy of the star catalogue exists before any worker processes start, so that
+    # they can each memory-map it rather than parsing the catalogue themselves
+    fetch_star_table()
+
+    if jobs > 1:
+        # Build the planispheres in a pool of worker processes
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(build_planisphere, *job) for job in build_jobs]
+
+            # Collect results, so that any exceptions raised by workers are reported
+            for future in futures:
+                future.result()
+    else:
+        for job in build_jobs:
+            build_planisphere(*job)
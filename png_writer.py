@@ -0,0 +1,195 @@
+# png_writer.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Write RGB images held in numpy arrays as PNG files, or as the frames of an animated PNG (APNG) file. The compression
+level can be lowered to write long sequences of frames quickly.
+"""
+
+import struct
+import zlib
+
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+# The eight bytes at the start of every PNG file
+png_signature: bytes = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """
+    Encode a single chunk of a PNG file, with its length and checksum.
+
+    :param chunk_type:
+        The four-letter type of the chunk, e.g. b"IDAT"
+    :param data:
+        The contents of the chunk
+    :return:
+        The encoded chunk
+    """
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def png_header(width: int, height: int) -> bytes:
+    """
+    Encode the header chunk of a PNG file containing an 8-bit RGB image.
+
+    :param width:
+        The width of the image, pixels
+    :param height:
+        The height of the image, pixels
+    :return:
+        The encoded IHDR chunk
+    """
+    return png_chunk(chunk_type=b"IHDR", data=struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+def compress_image(pixels: np.ndarray, compression_level: int = 1) -> bytes:
+    """
+    Compress an RGB image into the data stream stored in the IDAT chunks of a PNG file. Each row is stored as its
+    difference from the row above (PNG filter type 2), which is cheap to compute and compresses well.
+
+    :param pixels:
+        Array of 8-bit pixel values, with shape (height, width, 3)
+    :param compression_level:
+        The zlib compression level, from 0 (fastest) to 9 (smallest)
+    :return:
+        Compressed image data
+    """
+    height: int = pixels.shape[0]
+    rows: np.ndarray = np.ascontiguousarray(pixels, dtype=np.uint8).reshape((height, -1))
+
+    filtered: np.ndarray = np.empty((height, rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+
+    return zlib.compress(filtered.tobytes(), compression_level)
+
+
+def write_png(filename: str, pixels: np.ndarray, compression_level: int = 1) -> None:
+    """
+    Write an RGB image to a PNG file.
+
+    :param filename:
+        The filename of the PNG file to write
+    :param pixels:
+        Array of 8-bit pixel values, with shape (height, width, 3)
+    :param compression_level:
+        The zlib compression level, from 0 (fastest) to 9 (smallest)
+    :return:
+        None
+    """
+    with open(filename, "wb") as f_out:
+        f_out.write(png_signature)
+        f_out.write(png_header(width=pixels.shape[1], height=pixels.shape[0]))
+        f_out.write(png_chunk(chunk_type=b"IDAT",
+                              data=compress_image(pixels=pixels, compression_level=compression_level)))
+        f_out.write(png_chunk(chunk_type=b"IEND", data=b""))
+
+
+class AnimatedPngWriter:
+    """
+    Write a sequence of RGB images, all of the same size, as the frames of an animated PNG (APNG) file. Viewers which
+    do not understand animated PNGs show the first frame.
+    """
+
+    def __init__(self, filename: str, width: int, height: int, frame_count: int, frames_per_second: float = 25,
+                 compression_level: int = 1):
+        """
+        Write a sequence of RGB images as the frames of an animated PNG file.
+
+        :param filename:
+            The filename of the PNG file to write
+        :param width:
+            The width of each frame, pixels
+        :param height:
+            The height of each frame, pixels
+        :param frame_count:
+            The number of frames which will be written. This is stored in the header of the file.
+        :param frames_per_second:
+            The rate at which the frames should be played
+        :param compression_level:
+            The zlib compression level, from 0 (fastest) to 9 (smallest)
+        """
+        self.width: int = width
+        self.height: int = height
+        self.frame_count: int = frame_count
+        self.frames_per_second: float = frames_per_second
+        self.compression_level: int = compression_level
+
+        # Frame control chunks and frame data chunks share a single sequence of numbers
+        self.sequence_number: int = 0
+        self.frames_written: int = 0
+
+        self.file: Optional[BinaryIO] = open(filename, "wb")
+        self.file.write(png_signature)
+        self.file.write(png_header(width=width, height=height))
+        self.file.write(png_chunk(chunk_type=b"acTL", data=struct.pack(">II", frame_count, 0)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, err_type, err_value, err_tb):
+        self.close()
+
+    def write_frame(self, pixels: np.ndarray) -> None:
+        """
+        Append a frame to the animation.
+
+        :param pixels:
+            Array of 8-bit pixel values, with shape (height, width, 3)
+        :return:
+            None
+        """
+        assert self.file is not None, "Cannot write to an animation which has already been closed"
+        assert pixels.shape[:2] == (self.height, self.width), "All frames must be the same size"
+        assert self.frames_written < self.frame_count, "More frames written than declared"
+
+        # Each frame covers the whole image, and is displayed for 1/frames_per_second seconds
+        delay_denominator: int = 1000
+        delay_numerator: int = int(round(delay_denominator / self.frames_per_second))
+        self.file.write(png_chunk(chunk_type=b"fcTL",
+                                  data=struct.pack(">IIIIIHHBB", self.sequence_number, self.width, self.height, 0, 0,
+                                                   delay_numerator, delay_denominator, 0, 0)))
+        self.sequence_number += 1
+
+        # The first frame is stored as the default image of the PNG file; subsequent frames are stored in fdAT chunks
+        data: bytes = compress_image(pixels=pixels, compression_level=self.compression_level)
+        if self.frames_written == 0:
+            self.file.write(png_chunk(chunk_type=b"IDAT", data=data))
+        else:
+            self.file.write(png_chunk(chunk_type=b"fdAT", data=struct.pack(">I", self.sequence_number) + data))
+            self.sequence_number += 1
+        self.frames_written += 1
+
+    def close(self) -> None:
+        """
+        Finish writing the animation, and close the file.
+
+        :return:
+            None
+        """
+        if self.file is None:
+            return
+        assert self.frames_written == self.frame_count, "Fewer frames written than declared"
+        self.file.write(png_chunk(chunk_type=b"IEND", data=b""))
+        self.file.close()
+        self.file = None
@@ -0,0 +1,158 @@
+# pole_stars.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Find the bright stars nearest to the celestial pole at any epoch, using the index of star directions which is built
+on the star table shared with the star wheel.
+"""
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from bright_stars_process import fetch_star_table
+from constants import star_magnitude_limit, unit_deg
+from precession import equator_pole
+from proper_motion import catalog_epoch
+from settings import fetch_command_line_arguments
+from star_table import StarTable, unit_vectors
+
+
+def nearest_stars(direction: Sequence[float], k: int = 1, magnitude_limit: float = star_magnitude_limit,
+                  table: Optional[StarTable] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k bright stars closest to a direction on the sky, at J2000.
+
+    :param direction:
+        Vector (x, y, z) pointing in the direction to search around, in the J2000 equatorial frame
+    :param k:
+        The number of stars to return
+    :param magnitude_limit:
+        The faintest magnitude of star to return
+    :param table:
+        The table of stars to search. If None, the Yale Bright Star Catalogue used by the star wheel is searched.
+    :return:
+        Tuple of arrays (row numbers within the table, angular distances / degrees), nearest first
+    """
+    if table is None:
+        table = fetch_star_table()
+    return table.nearest_stars(direction=direction, k=k, magnitude_limit=magnitude_limit)
+
+
+def pole_star_timeline(epochs: Union[float, np.ndarray], k: int = 1, magnitude_limit: float = star_magnitude_limit,
+                       table: Optional[StarTable] = None, southern: bool = False, radius: float = 5,
+                       chunk_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k bright stars closest to the celestial pole at each of an array of epochs, allowing for both the
+    precession of the pole and the proper motions of the stars.
+
+    :param epochs:
+        Array of epochs, Julian years
+    :param k:
+        The number of stars to return for each epoch
+    :param magnitude_limit:
+        The faintest magnitude of star to return
+    :param table:
+        The table of stars to search. If None, the Yale Bright Star Catalogue used by the star wheel is searched.
+    :param southern:
+        Boolean flag indicating whether to search around the south celestial pole, rather than the north
+    :param radius:
+        The radius of the first search around each pole, degrees. This is doubled for any epochs where fewer than
+        k stars are found.
+    :param chunk_size:
+        The number of epochs to process at once, which bounds the memory used
+    :return:
+        Tuple of arrays (row numbers within the table, angular distances / degrees), each with shape
+        (number of epochs, k), nearest first. Missing stars are indicated by a row number of -1.
+    """
+    if table is None:
+        table = fetch_star_table()
+    epochs = np.atleast_1d(np.asarray(epochs, dtype=np.float64))
+
+    # The direction of the pole at each epoch, in the J2000 equatorial frame
+    poles: np.ndarray = equator_pole(epoch=epochs).T * (-1 if southern else 1)
+    pole_dec: np.ndarray = np.arcsin(np.clip(poles[:, 2], -1, 1)) / unit_deg
+
+    rows_out: np.ndarray = np.full((epochs.shape[0], k), -1, dtype=np.int64)
+    distance_out: np.ndarray = np.full((epochs.shape[0], k), np.nan)
+
+    # Epochs for which we have not yet found k stars
+    pending: np.ndarray = np.arange(epochs.shape[0])
+
+    while pending.shape[0] > 0:
+        unfinished: List[np.ndarray] = []
+
+        for start in range(0, pending.shape[0], chunk_size):
+            chunk: np.ndarray = pending[start:start + chunk_size]
+
+            # Stars may have moved this far from their J2000 positions by the most distant epoch in this chunk
+            chunk_epochs: np.ndarray = epochs[chunk]
+            margin: float = table.maximum_displacement(
+                epoch=float(chunk_epochs[np.argmax(np.abs(chunk_epochs - catalog_epoch))]))
+
+            # Only stars whose J2000 declinations lie near the poles of this chunk's epochs can be within the radius
+            candidates: np.ndarray = table.angular_index().candidates(
+                dec_min=float(np.min(pole_dec[chunk])) - radius - margin,
+                dec_max=float(np.max(pole_dec[chunk])) + radius + margin,
+                magnitude_limit=magnitude_limit)
+
+            # The positions of the candidate stars at each epoch, with shape (epochs, stars, 3)
+            ra, dec = table.positions_at_epoch(epoch=chunk_epochs, rows=candidates)
+            cos_distance: np.ndarray = np.einsum('esi,ei->es', unit_vectors(ra=ra, dec=dec), poles[chunk])
+            cos_distance[cos_distance < np.cos(radius * unit_deg)] = -np.inf
+
+            # Epochs with fewer than k stars within the search radius are searched again with a larger radius
+            found: np.ndarray = np.count_nonzero(np.isfinite(cos_distance), axis=1)
+            done: np.ndarray = (found >= k) | (radius >= 180)
+            unfinished.append(chunk[~done])
+            if not np.any(done):
+                continue
+
+            nearest: np.ndarray = np.argsort(-cos_distance[done], axis=1, kind='stable')[:, :k]
+            nearest_cos: np.ndarray = np.take_along_axis(cos_distance[done], nearest, axis=1)
+            valid: np.ndarray = np.isfinite(nearest_cos)
+            columns: int = nearest.shape[1]
+            rows_out[chunk[done], :columns] = np.where(valid, candidates[nearest], -1)
+            distance_out[chunk[done], :columns] = np.where(
+                valid, np.arccos(np.clip(nearest_cos, -1, 1)) / unit_deg, np.nan)
+
+        pending = np.concatenate(unfinished)
+        radius = min(radius * 2, 180)
+
+    return rows_out, distance_out
+
+
+# Do it right away if we're run as a script
+if __name__ == "__main__":
+    # Fetch command line arguments passed to us
+    arguments = fetch_command_line_arguments()
+
+    # List the bright star nearest to the north celestial pole every thousand years
+    star_table: StarTable = fetch_star_table()
+    years: np.ndarray = np.arange(-12000, 14001, 1000)
+    pole_star_rows, pole_star_distances = pole_star_timeline(epochs=years,
+                                                             magnitude_limit=arguments['magnitude_limit'],
+                                                             table=star_table)
+    for year, row, distance in zip(years, pole_star_rows[:, 0], pole_star_distances[:, 0]):
+        if row < 0:
+            continue
+        star = star_table.row(int(row))
+        names: List[str] = [item for item in (star[5], star[4], star[6]) if item != "-"]
+        name: str = names[0] if len(names) > 0 else "HR {:d}".format(int(star_table.hr[row]))
+        print("{:6d}  {:24s}  mag {:5.2f}  {:5.2f} deg from pole".format(int(year), name, star[2], distance))
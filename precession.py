@@ -0,0 +1,189 @@
+# precession.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+A long-term model of the precession of the Earth's axis, valid for ±200,000 years around J2000, from Vondrák, Capitaine
+& Wallace (2011), A&A 534, A22, as implemented in the SOFA routines iauLtpecl and iauLtpequ.
+
+Every function accepts either a single epoch or an array of epochs, and evaluates the model for all of them at once.
+"""
+
+from typing import Tuple, Union
+
+import numpy as np
+
+from constants import equatorial_to_ecliptic, unit_deg
+from proper_motion import unit_arcsec
+
+# The approximate period of the precession of the equinoxes, Julian years
+precession_period: float = 25772
+
+# Obliquity of the ecliptic at J2000, as used by the model
+obliquity_j2000: float = 84381.406 * unit_arcsec
+
+# Polynomial coefficients of the position of the ecliptic pole (P_A, Q_A), in arcseconds, in powers of Julian centuries
+# since J2000
+_ecliptic_polynomial: np.ndarray = np.array([
+    [5851.607687, -0.1189000, -0.00028913, 0.000000101],
+    [-1600.886300, 1.1689818, -0.00000020, -0.000000437]
+])
+
+# Periodic terms in the position of the ecliptic pole: period (centuries), then cos and sin coefficients for P_A and
+# Q_A (arcseconds)
+_ecliptic_periodic: np.ndarray = np.array([
+    [708.15, -5486.751211, -684.661560, 667.666730, -5523.863691],
+    [2309.00, -17.127623, 2446.283880, -2354.886252, -549.747450],
+    [1620.00, -617.517403, 399.671049, -428.152441, -310.998056],
+    [492.20, 413.442940, -356.652376, 376.202861, 421.535876],
+    [1183.00, 78.614193, -186.387003, 184.778874, -36.776172],
+    [622.00, -180.732815, -316.800070, 335.321713, -145.278396],
+    [882.00, -87.676083, 198.296701, -185.138669, -34.744450],
+    [547.00, 46.140315, 101.135679, -120.972830, 22.885731]
+])
+
+# Polynomial coefficients of the position of the celestial pole (X_A, Y_A), in arcseconds, in powers of Julian
+# centuries since J2000
+_equator_polynomial: np.ndarray = np.array([
+    [5453.282155, 0.4252841, -0.00037173, -0.000000152],
+    [-73750.930350, -0.7675452, -0.00018725, 0.000000231]
+])
+
+# Periodic terms in the position of the celestial pole: period (centuries), then cos and sin coefficients for X_A and
+# Y_A (arcseconds)
+_equator_periodic: np.ndarray = np.array([
+    [256.75, -819.940624, 75004.344875, 81491.287984, 1558.515853],
+    [708.15, -8444.676815, 624.033993, 787.163481, 7774.939698],
+    [274.20, 2600.009459, 1251.136893, 1251.296102, -2219.534038],
+    [241.45, 2755.175630, -1102.212834, -1257.950837, -2523.969396],
+    [2309.00, -167.659835, -2660.664980, -2966.799730, 247.850422],
+    [492.20, 871.855056, 699.291817, 639.744522, -846.485643],
+    [396.10, 44.769698, 153.167220, 131.600209, -1393.124055],
+    [288.90, -512.313065, -950.865637, -445.040117, 368.526116],
+    [231.10, -819.415595, 499.754645, 584.522874, 749.045012],
+    [1610.00, -538.071099, -145.188210, -89.756563, -444.704518],
+    [620.00, -189.793622, 558.532586, 524.429630, 235.934465],
+    [157.87, -402.922932, -23.923029, -13.549067, 374.049623],
+    [220.30, 179.516345, -165.405086, -210.157124, -171.330180],
+    [1200.00, -9.814756, 9.344131, -44.919798, -22.899655]
+])
+
+
+def _evaluate_series(epoch: Union[float, np.ndarray], polynomial: np.ndarray,
+                     periodic: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluate a pair of series, each the sum of a polynomial and periodic terms, for an array of epochs.
+
+    :param epoch:
+        Epoch, or array of epochs, Julian years
+    :param polynomial:
+        Array of polynomial coefficients, with shape (2, number of powers)
+    :param periodic:
+        Array of periodic terms, with shape (number of terms, 5)
+    :return:
+        Tuple of arrays of the two series, radians
+    """
+    t: np.ndarray = (np.asarray(epoch, dtype=np.float64) - 2000) / 100
+
+    # Periodic terms, with one column per term
+    angle: np.ndarray = 2 * np.pi * t[..., np.newaxis] / periodic[:, 0]
+    cos_angle: np.ndarray = np.cos(angle)
+    sin_angle: np.ndarray = np.sin(angle)
+    a: np.ndarray = cos_angle @ periodic[:, 1] + sin_angle @ periodic[:, 3]
+    b: np.ndarray = cos_angle @ periodic[:, 2] + sin_angle @ periodic[:, 4]
+
+    # Polynomial terms
+    a = a + np.polynomial.polynomial.polyval(t, polynomial[0])
+    b = b + np.polynomial.polynomial.polyval(t, polynomial[1])
+
+    return a * unit_arcsec, b * unit_arcsec
+
+
+def ecliptic_pole(epoch: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Return the direction of the pole of the ecliptic of date, in the J2000 equatorial frame.
+
+    :param epoch:
+        Epoch, or array of epochs, Julian years
+    :return:
+        Array of unit vectors, with shape (3, ...)
+    """
+    p, q = _evaluate_series(epoch=epoch, polynomial=_ecliptic_polynomial, periodic=_ecliptic_periodic)
+    w: np.ndarray = np.sqrt(np.maximum(1 - p * p - q * q, 0))
+    s: float = np.sin(obliquity_j2000)
+    c: float = np.cos(obliquity_j2000)
+    return np.stack((p, -q * c - w * s, -q * s + w * c))
+
+
+def equator_pole(epoch: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Return the direction of the celestial pole of date (the pole of the mean equator), in the J2000 equatorial frame.
+
+    :param epoch:
+        Epoch, or array of epochs, Julian years
+    :return:
+        Array of unit vectors, with shape (3, ...)
+    """
+    x, y = _evaluate_series(epoch=epoch, polynomial=_equator_polynomial, periodic=_equator_periodic)
+    w: np.ndarray = np.sqrt(np.maximum(1 - x * x - y * y, 0))
+    return np.stack((x, y, w))
+
+
+def obliquity(epoch: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Return the mean obliquity of the ecliptic of date: the angle between the celestial pole and the ecliptic pole.
+
+    :param epoch:
+        Epoch, or array of epochs, Julian years
+    :return:
+        Array of obliquities, degrees
+    """
+    dot: np.ndarray = np.sum(ecliptic_pole(epoch=epoch) * equator_pole(epoch=epoch), axis=0)
+    return np.arccos(np.clip(dot, -1, 1)) / unit_deg
+
+
+def celestial_pole_ecliptic_coordinates(epoch: Union[float, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the position of the north celestial pole of date, in J2000 ecliptic coordinates. These are the
+    coordinates used by the star wheel.
+
+    :param epoch:
+        Epoch, or array of epochs, Julian years
+    :return:
+        Tuple of arrays (ecliptic longitude, ecliptic latitude), degrees
+    """
+    x, y, z = np.tensordot(equatorial_to_ecliptic, equator_pole(epoch=epoch), axes=1)
+    lng: np.ndarray = np.arctan2(y, x) / unit_deg
+    lat: np.ndarray = np.arcsin(np.clip(z, -1, 1)) / unit_deg
+    return lng, lat
+
+
+def precession_angle(epoch: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Return the angle through which the north celestial pole has moved around the pole of the J2000 ecliptic since
+    J2000. This increases with time, by one revolution in roughly 25,800 years.
+
+    :param epoch:
+        Epoch, or array of epochs, Julian years
+    :return:
+        Array of angles, radians, in the range -pi to pi
+    """
+    lng, lat = celestial_pole_ecliptic_coordinates(epoch=epoch)
+
+    # The pole starts at an ecliptic longitude of 90 degrees, and moves westwards
+    return np.angle(np.exp(1j * (90 - lng) * unit_deg))
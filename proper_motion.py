@@ -0,0 +1,130 @@
+# proper_motion.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Propagate the positions of stars from the catalogue epoch (J2000) to other epochs, using their proper motions,
+parallaxes and radial velocities.
+"""
+
+from typing import Tuple, Union
+
+import numpy as np
+
+from constants import unit_deg
+
+# The epoch of the star catalogue, in Julian years
+catalog_epoch: float = 2000.0
+
+# One astronomical unit per Julian year, in km/s
+au_per_year: float = 4.740470446
+
+# One arcsecond, in radians
+unit_arcsec: float = unit_deg / 3600
+
+
+def propagate_positions(ra: np.ndarray, dec: np.ndarray, pm_ra: np.ndarray, pm_dec: np.ndarray,
+                        epoch: Union[float, np.ndarray], parallax: Union[float, np.ndarray] = 0,
+                        radial_velocity: Union[float, np.ndarray] = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Propagate the positions of stars from J2000 to other epochs, assuming that each star moves in a straight line
+    through space at constant velocity. Stars without a parallax or radial velocity are assumed to have no motion
+    along the line of sight.
+
+    If <epoch> is an array of shape (m,), and there are n stars, the returned arrays have shape (m, n), with one row
+    per epoch.
+
+    :param ra:
+        Array of the right ascensions of the stars at J2000, degrees
+    :param dec:
+        Array of the declinations of the stars at J2000, degrees
+    :param pm_ra:
+        Array of the proper motions of the stars in right ascension, multiplied by cos(dec), arcsec per year
+    :param pm_dec:
+        Array of the proper motions of the stars in declination, arcsec per year
+    :param epoch:
+        The epoch, or array of epochs, to propagate the positions to, Julian years
+    :param parallax:
+        Array of the parallaxes of the stars, arcsec
+    :param radial_velocity:
+        Array of the radial velocities of the stars, km/s
+    :return:
+        Tuple of arrays (ra, dec), degrees
+    """
+    ra_rad: np.ndarray = np.asarray(ra, dtype=np.float64) * unit_deg
+    dec_rad: np.ndarray = np.asarray(dec, dtype=np.float64) * unit_deg
+    epoch = np.asarray(epoch, dtype=np.float64)
+
+    # Unit vector towards each star, and unit vectors in the directions of increasing RA and Dec
+    sin_ra: np.ndarray = np.sin(ra_rad)
+    cos_ra: np.ndarray = np.cos(ra_rad)
+    sin_dec: np.ndarray = np.sin(dec_rad)
+    cos_dec: np.ndarray = np.cos(dec_rad)
+    position: np.ndarray = np.stack((cos_dec * cos_ra, cos_dec * sin_ra, sin_dec))
+    east: np.ndarray = np.stack((-sin_ra, cos_ra, np.zeros_like(ra_rad)))
+    north: np.ndarray = np.stack((-sin_dec * cos_ra, -sin_dec * sin_ra, cos_dec))
+
+    # The motion of each star per year, in units of its distance from the Sun. The radial component is the radial
+    # velocity, converted into a fractional change in distance per year.
+    pm_radial: np.ndarray = (np.asarray(radial_velocity, dtype=np.float64) *
+                             np.asarray(parallax, dtype=np.float64) / au_per_year)
+    velocity: np.ndarray = (np.asarray(pm_ra, dtype=np.float64) * east +
+                            np.asarray(pm_dec, dtype=np.float64) * north +
+                            pm_radial * position) * unit_arcsec
+
+    # Move each star along its path, for each of the requested epochs
+    elapsed: np.ndarray = (epoch - catalog_epoch)[..., np.newaxis]
+    x: np.ndarray = position[0] + elapsed * velocity[0]
+    y: np.ndarray = position[1] + elapsed * velocity[1]
+    z: np.ndarray = position[2] + elapsed * velocity[2]
+
+    ra_new: np.ndarray = np.mod(np.arctan2(y, x), 2 * np.pi) / unit_deg
+    dec_new: np.ndarray = np.arctan2(z, np.hypot(x, y)) / unit_deg
+    return ra_new, dec_new
+
+
+def maximum_displacement(pm_ra: np.ndarray, pm_dec: np.ndarray, epoch: float,
+                         parallax: Union[float, np.ndarray] = 0,
+                         radial_velocity: Union[float, np.ndarray] = 0) -> float:
+    """
+    Return the furthest distance that any star moves across the sky between J2000 and another epoch, as computed by
+    <propagate_positions>.
+
+    :param pm_ra:
+        Array of the proper motions of the stars in right ascension, multiplied by cos(dec), arcsec per year
+    :param pm_dec:
+        Array of the proper motions of the stars in declination, arcsec per year
+    :param epoch:
+        The epoch to propagate positions to, Julian years
+    :param parallax:
+        Array of the parallaxes of the stars, arcsec
+    :param radial_velocity:
+        Array of the radial velocities of the stars, km/s
+    :return:
+        Angular distance, degrees
+    """
+    if len(pm_ra) == 0:
+        return 0.
+    elapsed: float = epoch - catalog_epoch
+
+    # Each star moves along a straight line; its direction changes by the angle subtended by its transverse motion,
+    # as seen from its new distance along the line of sight
+    transverse: np.ndarray = np.hypot(pm_ra, pm_dec) * unit_arcsec * abs(elapsed)
+    radial: np.ndarray = 1 + (np.asarray(radial_velocity, dtype=np.float64) *
+                              np.asarray(parallax, dtype=np.float64) / au_per_year) * unit_arcsec * elapsed
+    return float(np.max(np.arctan2(transverse, radial))) / unit_deg
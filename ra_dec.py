@@ -22,17 +22,51 @@
 Render the optional ra-dec grid of the precession planisphere.
 """
 
-from math import atan2
-from numpy import arange
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
 
-from constants import radius, transform, pos
-from constants import unit_deg, unit_rev, unit_mm, inclination_ecliptic, central_hole_size
+import numpy as np
+
+from constants import horizon_label_position, project_array
+from constants import unit_mm, inclination_ecliptic, central_hole_size
 from graphics_context import BaseComponent, GraphicsContext
 from settings import fetch_command_line_arguments
 from text import text
 
 
+@lru_cache(maxsize=None)
+def ra_dec_grid_lines(latitude: float, dec_edge: float,
+                      ra_step: float) -> Dict[str, Sequence[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Project all the lines of the ra-dec grid into planispheric coordinates. The grid is the same for both
+    hemispheres, so the result is cached.
+
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :param dec_edge:
+        The declination of the outer edge of the grid, degrees
+    :param ra_step:
+        The step in right ascension between the vertices of the edge and the equator, degrees
+    :return:
+        Dictionary of tuples of (x, y) arrays of the vertices of each line, metres
+    """
+    lines: Dict[str, Sequence[Tuple[np.ndarray, np.ndarray]]] = {
+        'edge': (project_array(alt=dec_edge, az=np.arange(0, 360.5, ra_step), latitude=latitude),),
+        'equator': (project_array(alt=0, az=np.arange(0, 360.5, ra_step), latitude=latitude),),
+        'declination': tuple(project_array(alt=dec, az=np.arange(0, 360.5, 1), latitude=latitude)
+                             for dec in range(10, 85, 10)),
+        'right_ascension': tuple(project_array(alt=np.arange(0, 90.1, 1), az=ra, latitude=latitude)
+                                 for ra in np.arange(0, 359, 15))
+    }
+
+    # The cached arrays are shared between renders, so must not be modified
+    for line_list in lines.values():
+        for line in line_list:
+            for array in line:
+                array.setflags(write=False)
+    return lines
+
+
 class RaDecGrid(BaseComponent):
     """
     Render the optional ra-dec grid of the precession planisphere.
@@ -66,17 +100,11 @@ class RaDecGrid(BaseComponent):
         # Trace around the equator, keeping track of minimum and maximum coordinates
         dec_edge: float = -12
 
-        path: List[Tuple[float, float]] = [
-            transform(alt=dec_edge, az=az, latitude=latitude) for az in arange(0, 360.5, 1)
-        ]
-
-        for p in path:
-            r_b: float = radius(dec=p[1] / unit_deg, latitude=latitude)
-            position: Dict[str, float] = pos(r_b, p[0])
-            bounding_box['x_min'] = min(bounding_box['x_min'], position['x'])
-            bounding_box['x_max'] = max(bounding_box['x_max'], position['x'])
-            bounding_box['y_min'] = min(bounding_box['y_min'], position['y'])
-            bounding_box['y_max'] = max(bounding_box['y_max'], position['y'])
+        x, y = project_array(alt=dec_edge, az=np.arange(0, 360.5, 1), latitude=latitude)
+        bounding_box['x_min'] = min(bounding_box['x_min'], float(x.min()))
+        bounding_box['x_max'] = max(bounding_box['x_max'], float(x.max()))
+        bounding_box['y_min'] = min(bounding_box['y_min'], float(y.min()))
+        bounding_box['y_max'] = max(bounding_box['y_max'], float(y.max()))
 
         return bounding_box
 
@@ -101,25 +129,20 @@ class RaDecGrid(BaseComponent):
         dec_edge: float = -10
         ra_step: float = 1
 
+        # Project all the lines of the grid, or fetch them from the cache if we've drawn this grid before
+        lines: Dict[str, Sequence[Tuple[np.ndarray, np.ndarray]]] = ra_dec_grid_lines(latitude=latitude,
+                                                                                       dec_edge=dec_edge,
+                                                                                       ra_step=ra_step)
+
         # Draw equator (declination 0), and line to cut around edge of window (declination dec_edge)
-        dec: float
-        for dec in (dec_edge, 0):
-            # Draw a line, segment by segment, taking small steps in azimuth
-            path: List[Tuple[float, float]] = [
-                transform(alt=dec, az=ra, latitude=latitude) for ra in arange(0, 360.5, ra_step)
-            ]
-
-            # Project line from equatorial coordinates into planispheric coordinates
+        x: np.ndarray
+        y: np.ndarray
+        for is_edge, (x, y) in ((True, lines['edge'][0]), (False, lines['equator'][0])):
             context.begin_path()
-            for i, p in enumerate(path):
-                r_b: float = radius(dec=p[1] / unit_deg, latitude=latitude)
-                if i == 0:
-                    context.move_to(**pos(r_b, p[0]))
-                else:
-                    context.line_to(**pos(r_b, p[0]))
+            context.polyline(xs=x, ys=y)
             context.stroke()
 
-            if dec == dec_edge:
+            if is_edge:
                 # Draw the central hole in the middle of the viewing window
                 context.begin_sub_path()
                 context.circle(centre_x=0, centre_y=0, radius=central_hole_size)
@@ -130,47 +153,20 @@ class RaDecGrid(BaseComponent):
 
         # Draw lines of constant declination
         context.begin_path()
-        for dec in range(10, 85, 10):
-            path: List[Tuple[float, float]] = [
-                transform(alt=dec, az=ra, latitude=latitude) for ra in arange(0, 360.5, 1)
-            ]
-            for i, p in enumerate(path):
-                r_b: float = radius(dec=p[1] / unit_deg, latitude=latitude)
-                if i == 0:
-                    context.move_to(**pos(r_b, p[0]))
-                else:
-                    context.line_to(**pos(r_b, p[0]))
+        context.polylines(lines=lines['declination'])
         context.stroke(color=(0.5, 0.5, 0.5, 1))
 
         # Draw lines of constant right ascension, and 1 hour intervals
         context.begin_path()
-        for ra in arange(0, 359, 15):
-            path: List[Tuple[float, float]] = [
-                transform(alt=dec, az=ra, latitude=latitude) for dec in arange(0, 90.1, 1)
-            ]
-            for i, p in enumerate(path):
-                r_b: float = radius(dec=p[1] / unit_deg, latitude=latitude)
-                if i == 0:
-                    context.move_to(**pos(r_b, p[0]))
-                else:
-                    context.line_to(**pos(r_b, p[0]))
+        context.polylines(lines=lines['right_ascension'])
         context.stroke(color=(0.5, 0.5, 0.5, 1))
 
         # Gluing labels
         def make_gluing_label(azimuth: float) -> None:
-            pp: Tuple[float, float] = transform(alt=0, az=azimuth - 0.01, latitude=latitude)
-            r: float = radius(dec=pp[1] / unit_deg, latitude=latitude)
-            p: Dict[str, float] = pos(r, pp[0])
-
-            pp2: Tuple[float, float] = transform(alt=0, az=azimuth + 0.01, latitude=latitude)
-            r2: float = radius(dec=pp2[1] / unit_deg, latitude=latitude)
-            p2: Dict[str, float] = pos(r2, pp2[0])
-
-            p3: List[float] = [p2[i] - p[i] for i in ('x', 'y')]
-            tr: float = -unit_rev / 4 - atan2(p3[0], p3[1])
+            x, y, tr = horizon_label_position(azimuth=azimuth, latitude=latitude)
 
             context.text(text=text[language]["glue_here"],
-                         x=p['x'], y=p['y'],
+                         x=x, y=y,
                          h_align=0, v_align=1, gap=unit_mm, rotation=tr)
 
         # Write the text "Glue here" at various points around the equator
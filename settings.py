@@ -23,7 +23,12 @@ Define a common command-line interface which is shared between all the scripts.
 
 import argparse
 
-from typing import Dict
+from typing import Dict, List
+
+from constants import star_magnitude_limit
+from proper_motion import catalog_epoch
+from star_stream import catalog_layouts
+from themes import themes
 
 
 def fetch_command_line_arguments(default_filename: str = '') -> Dict[str, str]:
@@ -41,10 +46,55 @@ def fetch_command_line_arguments(default_filename: str = '') -> Dict[str, str]:
                         help="Filename for output, without a file type suffix.")
     parser.add_argument('--theme', dest='theme', choices=["default", "dark"], default="default",
                         help="Color theme to be used in the precession planisphere.")
+    parser.add_argument('--themes', dest='themes', nargs='+', choices=sorted(themes) + ["all"], default=None,
+                        help="Color themes in which to build the full set of planispheres, or 'all'. Defaults to the "
+                             "single theme passed to --theme.")
+    parser.add_argument('--jobs', dest='jobs', type=int, default=1,
+                        help="The number of planispheres to build in parallel.")
+    parser.add_argument('--force', dest='force', action='store_true',
+                        help="Rebuild all outputs, even those whose inputs have not changed.")
+    parser.add_argument('--backend', dest='backend', choices=["latex", "native"], default="latex",
+                        help="The tool used to assemble the parts of each planisphere into a PDF document: "
+                             "pdflatex, or a native renderer which draws the pages directly with cairo.")
+    parser.add_argument('--magnitude-limit', dest='magnitude_limit', type=float, default=star_magnitude_limit,
+                        help="The faintest magnitude of star to show on the star wheel.")
+    parser.add_argument('--star-catalog', dest='star_catalog', default=None,
+                        help="A fixed-width star catalogue, optionally compressed with gzip, to draw the stars on the "
+                             "star wheel from, in place of the Yale Bright Star Catalogue.")
+    parser.add_argument('--catalog-layout', dest='catalog_layout', choices=sorted(catalog_layouts), default="bsc",
+                        help="The layout of the columns in the star catalogue passed to --star-catalog.")
+    parser.add_argument('--epoch', dest='epoch', type=float, default=catalog_epoch,
+                        help="The epoch at which to show the positions of the stars, allowing for their proper "
+                             "motions, in years. Cannot be combined with --star-catalog.")
+    parser.add_argument('--frames', dest='frames', type=int, default=241,
+                        help="The number of frames in animations of the precession of the celestial pole.")
+    parser.add_argument('--animated', dest='animated', action='store_true',
+                        help="Write animations as a single animated PNG file, rather than as a numbered sequence of "
+                             "PNG files.")
     args = parser.parse_args()
 
+    # We only know the proper motions of the stars in the Yale Bright Star Catalogue
+    if args.star_catalog is not None and args.epoch != catalog_epoch:
+        parser.error("--epoch cannot be combined with --star-catalog, since the proper motions of the stars in "
+                     "external catalogues are not read")
+
+    # Build the full set of planispheres in every theme if "all" is requested, otherwise in the listed themes
+    theme_list: List[str] = [args.theme] if args.themes is None else args.themes
+    if "all" in theme_list:
+        theme_list = sorted(themes)
+
     return {
         "img_format": args.img_format,
         "filename": args.filename,
-        "theme": args.theme
+        "theme": args.theme,
+        "themes": sorted(set(theme_list)),
+        "jobs": max(1, args.jobs),
+        "force": args.force,
+        "backend": args.backend,
+        "magnitude_limit": args.magnitude_limit,
+        "star_catalog": args.star_catalog,
+        "catalog_layout": args.catalog_layout,
+        "epoch": args.epoch,
+        "frames": max(1, args.frames),
+        "animated": args.animated
     }
@@ -0,0 +1,208 @@
+# star_stream.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Read large fixed-width star catalogues, such as Hipparcos or Tycho, in fixed-size chunks, so that memory usage is
+bounded by the chunk size rather than by the size of the catalogue. The layout of the columns in each catalogue is
+described by a ColumnLayout object, so that catalogues in other formats can be read by defining new layouts.
+"""
+
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from constants import EclipticPositions, r_2, ra_dec_to_ecliptic_array
+from fixed_width import iterate_fixed_width_records, decode_float_column
+
+# The positions and magnitudes of a chunk of stars: (ra / degrees, dec / degrees, magnitude)
+StarBatch = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class ColumnLayout:
+    """
+    Describe where to find the position and magnitude of each star in the lines of a fixed-width star catalogue.
+    """
+
+    def __init__(self, record_width: int, min_length: int = 0, comment_character: str = '#'):
+        """
+        Describe where to find the position and magnitude of each star in the lines of a fixed-width star catalogue.
+
+        :param record_width:
+            The number of characters we need to read from the start of each line
+        :param min_length:
+            Discard lines shorter than this number of characters, including the newline character
+        :param comment_character:
+            Discard lines which begin with this character
+        """
+        self.record_width: int = record_width
+        self.min_length: int = min_length
+        self.comment_character: str = comment_character
+
+    def decode(self, records: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decode the position and magnitude of each star from an array of fixed-width records.
+
+        :param records:
+            Array of bytes, with shape (number of lines, record_width)
+        :return:
+            Tuple of arrays (ra / degrees, dec / degrees, magnitude, valid), where <valid> indicates which lines
+            were successfully parsed
+        """
+        raise NotImplementedError("Derived classes of type <ColumnLayout> must implement a method <decode> which "
+                                  "reads the position and magnitude of each star from the records of a catalogue.")
+
+
+class DecimalColumnLayout(ColumnLayout):
+    """
+    A catalogue which lists the right ascension and declination of each star in decimal degrees (or decimal hours
+    of right ascension), and its magnitude, each in a single column.
+    """
+
+    def __init__(self, record_width: int, ra_columns: Tuple[int, int], dec_columns: Tuple[int, int],
+                 mag_columns: Tuple[int, int], ra_in_hours: bool = False, min_length: int = 0,
+                 comment_character: str = '#'):
+        """
+        A catalogue which lists the position of each star in decimal degrees, and its magnitude.
+
+        :param record_width:
+            The number of characters we need to read from the start of each line
+        :param ra_columns:
+            The (start, stop) character positions of the right ascension column, as in Python string slicing
+        :param dec_columns:
+            The (start, stop) character positions of the declination column
+        :param mag_columns:
+            The (start, stop) character positions of the magnitude column
+        :param ra_in_hours:
+            Boolean flag indicating that right ascensions are given in hours, rather than degrees
+        :param min_length:
+            Discard lines shorter than this number of characters, including the newline character
+        :param comment_character:
+            Discard lines which begin with this character
+        """
+        super().__init__(record_width=record_width, min_length=min_length, comment_character=comment_character)
+        self.ra_columns: Tuple[int, int] = ra_columns
+        self.dec_columns: Tuple[int, int] = dec_columns
+        self.mag_columns: Tuple[int, int] = mag_columns
+        self.ra_in_hours: bool = ra_in_hours
+
+    def decode(self, records: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        ra, ra_valid = decode_float_column(records=records, start=self.ra_columns[0], stop=self.ra_columns[1])
+        dec, dec_valid = decode_float_column(records=records, start=self.dec_columns[0], stop=self.dec_columns[1])
+        mag, mag_valid = decode_float_column(records=records, start=self.mag_columns[0], stop=self.mag_columns[1])
+        if self.ra_in_hours:
+            ra *= 360 / 24
+        return ra, dec, mag, ra_valid & dec_valid & mag_valid
+
+
+class BrightStarCatalogLayout(ColumnLayout):
+    """
+    The Yale Bright Star Catalogue, which lists the position of each star in sexagesimal units.
+    """
+
+    def __init__(self):
+        super().__init__(record_width=170, min_length=100)
+
+    def decode(self, records: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Read the right ascension of each star (J2000)
+        ra_hrs, ra_hrs_valid = decode_float_column(records=records, start=75, stop=77)
+        ra_min, ra_min_valid = decode_float_column(records=records, start=77, stop=79)
+        ra_sec, ra_sec_valid = decode_float_column(records=records, start=79, stop=82)
+
+        # Read the declination of each star (J2000)
+        dec_neg: np.ndarray = records[:, 83] == ord('-')
+        dec_deg, dec_deg_valid = decode_float_column(records=records, start=84, stop=86)
+        dec_min, dec_min_valid = decode_float_column(records=records, start=86, stop=88)
+        dec_sec, dec_sec_valid = decode_float_column(records=records, start=88, stop=90)
+
+        # Read the V magnitude of each star
+        mag, mag_valid = decode_float_column(records=records, start=102, stop=107)
+
+        # Turn RA and Dec from sexagesimal units into decimal
+        ra: np.ndarray = (ra_hrs + ra_min / 60 + ra_sec / 3600) / 24 * 360
+        dec: np.ndarray = (dec_deg + dec_min / 60 + dec_sec / 3600)
+        dec[dec_neg] *= -1
+
+        valid: np.ndarray = (ra_hrs_valid & ra_min_valid & ra_sec_valid &
+                             dec_deg_valid & dec_min_valid & dec_sec_valid & mag_valid)
+        return ra, dec, mag, valid
+
+
+# The column layouts of the star catalogues we know how to read, indexed by name. The Hipparcos layout is that of
+# <hip_main.dat>, as described in the catalogue's ReadMe file.
+catalog_layouts: Dict[str, ColumnLayout] = {
+    'bsc': BrightStarCatalogLayout(),
+    'hipparcos': DecimalColumnLayout(record_width=76, ra_columns=(51, 63), dec_columns=(64, 76),
+                                     mag_columns=(41, 46))
+}
+
+
+def stream_star_catalog(filename: str, layout: ColumnLayout, magnitude_limit: Optional[float] = None,
+                        chunk_size: int = 65536) -> Iterator[StarBatch]:
+    """
+    Read a fixed-width star catalogue in chunks, yielding the positions and magnitudes of the stars in each chunk
+    which could be parsed, and which are at least as bright as a magnitude limit.
+
+    :param filename:
+        The filename of the catalogue to read. This may be compressed with gzip, if the filename ends in <.gz>.
+    :param layout:
+        The layout of the columns in the catalogue
+    :param magnitude_limit:
+        The faintest magnitude of star to return, or None to return all stars
+    :param chunk_size:
+        The number of lines of the catalogue to read in each chunk
+    :return:
+        Iterator over tuples of arrays (ra / degrees, dec / degrees, magnitude)
+    """
+    records: np.ndarray
+    for records in iterate_fixed_width_records(filename=filename, width=layout.record_width, chunk_size=chunk_size,
+                                               min_length=layout.min_length,
+                                               comment_character=layout.comment_character):
+        ra, dec, mag, valid = layout.decode(records=records)
+        if magnitude_limit is not None:
+            valid &= mag <= magnitude_limit
+        yield ra[valid], dec[valid], mag[valid]
+
+
+def stream_projected_stars(filename: str, layout: ColumnLayout, magnitude_limit: float, latitude: float,
+                           southern: bool = False, chunk_size: int = 65536) -> Iterator[StarBatch]:
+    """
+    Read a fixed-width star catalogue in chunks, and project the stars in each chunk onto the star wheel, yielding
+    only those stars which are at least as bright as a magnitude limit, and which fall within the star chart.
+
+    :param filename:
+        The filename of the catalogue to read. This may be compressed with gzip, if the filename ends in <.gz>.
+    :param layout:
+        The layout of the columns in the catalogue
+    :param magnitude_limit:
+        The faintest magnitude of star to return
+    :param latitude:
+        The latitude of the planisphere, degrees
+    :param southern:
+        Boolean flag indicating whether to flip the sky upside down, for a southern hemisphere planisphere
+    :param chunk_size:
+        The number of lines of the catalogue to read in each chunk
+    :return:
+        Iterator over tuples of arrays (x / metres, y / metres, magnitude)
+    """
+    for ra, dec, mag in stream_star_catalog(filename=filename, layout=layout, magnitude_limit=magnitude_limit,
+                                            chunk_size=chunk_size):
+        lng, lat = ra_dec_to_ecliptic_array(ra=ra * 12 / 180, dec=dec)
+        x, y, r = EclipticPositions(lng=lng, lat=lat).project(latitude=latitude, southern=southern)
+        visible: np.ndarray = r <= r_2
+        yield x[visible], y[visible], mag[visible]
@@ -0,0 +1,578 @@
+# star_table.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+A compact columnar table of stars, with one numpy array per catalogue column.
+"""
+
+import os
+import shutil
+
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from constants import EclipticPositions, ra_dec_to_ecliptic_array, unit_deg
+from proper_motion import maximum_displacement, propagate_positions
+
+# The tuple returned for each star by the dictionary-compatible view of a StarTable
+StarTuple = Tuple[float, float, float, str, str, str, str]
+
+
+def unit_vectors(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+    """
+    Convert arrays of equatorial coordinates into unit vectors.
+
+    :param ra:
+        Array of right ascensions, degrees
+    :param dec:
+        Array of declinations, degrees
+    :return:
+        Array of unit vectors (x, y, z), with shape (..., 3)
+    """
+    ra_rad: np.ndarray = np.asarray(ra, dtype=np.float64) * unit_deg
+    dec_rad: np.ndarray = np.asarray(dec, dtype=np.float64) * unit_deg
+    cos_dec: np.ndarray = np.cos(dec_rad)
+    return np.stack((cos_dec * np.cos(ra_rad), cos_dec * np.sin(ra_rad), np.sin(dec_rad)), axis=-1)
+
+
+class StringColumn:
+    """
+    A column of strings, stored as an array of integer codes into a list of the distinct strings in the column. Each
+    string is only converted into a Python object when it is looked up.
+    """
+
+    def __init__(self, codes: np.ndarray, values: Sequence[str]):
+        """
+        A column of strings, stored as an array of integer codes into a list of the distinct strings in the column.
+
+        :param codes:
+            Array of integer indices into <values>, one per row of the column
+        :param values:
+            The distinct strings which appear in the column
+        """
+        self.codes: np.ndarray = np.asarray(codes, dtype=np.int32)
+        self.values: np.ndarray = np.asarray(values, dtype=str)
+
+    @classmethod
+    def from_strings(cls, strings: Sequence[str]) -> 'StringColumn':
+        """
+        Build a column from a sequence of strings, storing each distinct string only once.
+
+        :param strings:
+            The string in each row of the column
+        :return:
+            StringColumn
+        """
+        if len(strings) == 0:
+            return cls(codes=np.zeros(0, dtype=np.int32), values=[])
+        values, codes = np.unique(np.asarray(strings, dtype=str), return_inverse=True)
+        return cls(codes=codes, values=values)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, index: int) -> str:
+        return str(self.values[self.codes[index]])
+
+    def take(self, indices: np.ndarray) -> 'StringColumn':
+        """
+        Return a new column containing only the rows with the specified indices.
+
+        :param indices:
+            Array of row indices, or a Boolean mask
+        :return:
+            StringColumn
+        """
+        return StringColumn(codes=self.codes[indices], values=self.values)
+
+    def decode(self) -> List[str]:
+        """
+        Return the contents of this column as a list of Python strings.
+        """
+        return self.values[self.codes].tolist()
+
+
+class MagnitudeLatitudeIndex:
+    """
+    An index of stars, which divides the sky into bands of ecliptic latitude, and sorts the stars in each band by
+    magnitude. This finds all the stars brighter than a magnitude limit within a range of ecliptic latitude, in time
+    proportional to the number of stars found.
+    """
+
+    def __init__(self, mag: np.ndarray, lat: np.ndarray, band_width: float = 10):
+        """
+        An index of stars, sorted by magnitude within bands of ecliptic latitude.
+
+        :param mag:
+            The magnitude of each star
+        :param lat:
+            The ecliptic latitude of each star, degrees
+        :param band_width:
+            The width of each band of ecliptic latitude, degrees
+        """
+        self.band_width: float = band_width
+        self.band_count: int = int(np.ceil(180 / band_width))
+        self.lat: np.ndarray = lat
+
+        band: np.ndarray = self.band_of(lat)
+
+        # Sort the stars by band, and then by magnitude within each band
+        self.order: np.ndarray = np.lexsort((mag, band))
+        self.sorted_mag: np.ndarray = mag[self.order]
+        self.band_starts: np.ndarray = np.searchsorted(band[self.order], np.arange(self.band_count + 1))
+
+    def band_of(self, lat: np.ndarray) -> np.ndarray:
+        """
+        Return the number of the band of ecliptic latitude containing each of an array of latitudes.
+
+        :param lat:
+            Array of ecliptic latitudes, degrees
+        :return:
+            Array of band numbers
+        """
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.band_width).astype(np.int64), 0, self.band_count - 1)
+
+    def query(self, magnitude_limit: float, lat_min: float = -90, lat_max: float = 90) -> np.ndarray:
+        """
+        Find all the stars at least as bright as a magnitude limit, within a range of ecliptic latitude.
+
+        :param magnitude_limit:
+            The faintest magnitude of star to return
+        :param lat_min:
+            The lowest ecliptic latitude of star to return, degrees
+        :param lat_max:
+            The highest ecliptic latitude of star to return, degrees
+        :return:
+            Array of the row numbers of the stars found, in ascending order
+        """
+        matches: List[np.ndarray] = []
+        band: int
+        for band in range(int(self.band_of(lat_min)), int(self.band_of(lat_max)) + 1):
+            start: int = int(self.band_starts[band])
+            end: int = int(self.band_starts[band + 1])
+
+            # Stars in each band are sorted by magnitude, so the stars we want are the first ones in the band
+            end = start + int(np.searchsorted(self.sorted_mag[start:end], magnitude_limit, side='right'))
+            matches.append(self.order[start:end])
+
+        rows: np.ndarray = np.concatenate(matches) if len(matches) > 0 else np.zeros(0, dtype=np.int64)
+
+        # The bands at either end of the range may contain some stars outside it
+        rows = rows[(self.lat[rows] >= lat_min) & (self.lat[rows] <= lat_max)]
+        return np.sort(rows)
+
+
+class AngularIndex:
+    """
+    An index of the directions of stars on the sky, as unit vectors in the J2000 equatorial frame. The stars are
+    divided into bands of declination, and sorted by magnitude within each band, so that the stars near any
+    direction can be found without measuring the distance to every star in the catalogue.
+    """
+
+    def __init__(self, ra: np.ndarray, dec: np.ndarray, mag: np.ndarray, band_width: float = 5):
+        """
+        An index of the directions of stars on the sky.
+
+        :param ra:
+            The right ascension of each star (J2000), degrees
+        :param dec:
+            The declination of each star (J2000), degrees
+        :param mag:
+            The magnitude of each star
+        :param band_width:
+            The width of each band of declination, degrees
+        """
+        self.vectors: np.ndarray = unit_vectors(ra=ra, dec=dec)
+        self.bands: MagnitudeLatitudeIndex = MagnitudeLatitudeIndex(mag=mag, lat=dec, band_width=band_width)
+
+    def candidates(self, dec_min: float, dec_max: float, magnitude_limit: float = np.inf) -> np.ndarray:
+        """
+        Find all the stars at least as bright as a magnitude limit, within a range of declination. Every star within
+        an angle r of a direction with declination d lies between declinations d-r and d+r.
+
+        :param dec_min:
+            The lowest declination of star to return, degrees
+        :param dec_max:
+            The highest declination of star to return, degrees
+        :param magnitude_limit:
+            The faintest magnitude of star to return
+        :return:
+            Array of the row numbers of the stars found, in ascending order
+        """
+        return self.bands.query(magnitude_limit=magnitude_limit, lat_min=max(dec_min, -90), lat_max=min(dec_max, 90))
+
+    def nearest(self, direction: Sequence[float], k: int = 1, magnitude_limit: float = np.inf,
+                radius: float = 2) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k stars closest to a direction on the sky. The search starts within a small radius of the
+        direction, which is doubled until at least k stars are found.
+
+        :param direction:
+            Vector (x, y, z) pointing in the direction to search around, in the J2000 equatorial frame. It need not
+            be normalised.
+        :param k:
+            The number of stars to return
+        :param magnitude_limit:
+            The faintest magnitude of star to return
+        :param radius:
+            The radius of the first search, degrees
+        :return:
+            Tuple of arrays (row numbers, angular distances / degrees), nearest first. Fewer than k stars are
+            returned if there are fewer than k stars as bright as the magnitude limit.
+        """
+        direction = np.asarray(direction, dtype=np.float64)
+        direction = direction / np.linalg.norm(direction)
+        dec: float = float(np.arcsin(np.clip(direction[2], -1, 1))) / unit_deg
+
+        while True:
+            rows: np.ndarray = self.candidates(dec_min=dec - radius, dec_max=dec + radius,
+                                               magnitude_limit=magnitude_limit)
+            cos_distance: np.ndarray = self.vectors[rows] @ direction
+            inside: np.ndarray = cos_distance >= np.cos(radius * unit_deg)
+            if np.count_nonzero(inside) >= k or radius >= 180:
+                break
+            radius = min(radius * 2, 180)
+
+        rows, cos_distance = rows[inside], cos_distance[inside]
+        nearest: np.ndarray = np.argsort(-cos_distance, kind='stable')[:k]
+        return rows[nearest], np.arccos(np.clip(cos_distance[nearest], -1, 1)) / unit_deg
+
+
+class StarTable:
+    """
+    A compact columnar table of stars, with one numpy array per catalogue column.
+    """
+
+    # The names of the numeric columns of the table
+    numeric_columns: Tuple[str, ...] = ('ra', 'dec', 'mag', 'hd', 'hr',
+                                        'pm_ra', 'pm_dec', 'parallax', 'radial_velocity')
+
+    # The names of the columns of strings which hold the names of each star
+    name_columns: Tuple[str, ...] = ('name_bayer', 'name_bayer_full', 'name_english', 'name_flamsteed_full')
+
+    def __init__(self, ra: np.ndarray, dec: np.ndarray, mag: np.ndarray, hd: np.ndarray, hr: np.ndarray,
+                 name_bayer: StringColumn, name_bayer_full: StringColumn,
+                 name_english: StringColumn, name_flamsteed_full: StringColumn,
+                 pm_ra: Optional[np.ndarray] = None, pm_dec: Optional[np.ndarray] = None,
+                 parallax: Optional[np.ndarray] = None, radial_velocity: Optional[np.ndarray] = None):
+        """
+        A compact columnar table of stars, with one numpy array per catalogue column.
+
+        :param ra:
+            The right ascension of each star (J2000), degrees
+        :param dec:
+            The declination of each star (J2000), degrees
+        :param mag:
+            The V magnitude of each star
+        :param hd:
+            The Henry Draper (HD) catalogue number of each star
+        :param hr:
+            The Bright Star (HR) catalogue number of each star
+        :param name_bayer:
+            The Bayer designation of each star, e.g. a Greek letter, or "-"
+        :param name_bayer_full:
+            The Bayer designation of each star, including constellation, or "-"
+        :param name_english:
+            The common name of each star, or "-"
+        :param name_flamsteed_full:
+            The Flamsteed designation of each star, including constellation, or "-"
+        :param pm_ra:
+            The proper motion of each star in right ascension, multiplied by cos(dec), arcsec per year. Zero if None.
+        :param pm_dec:
+            The proper motion of each star in declination, arcsec per year. Zero if None.
+        :param parallax:
+            The parallax of each star, arcsec, or zero if unknown. Zero if None.
+        :param radial_velocity:
+            The radial velocity of each star, km/s, or zero if unknown. Zero if None.
+        """
+        self.ra: np.ndarray = np.asarray(ra, dtype=np.float64)
+        self.dec: np.ndarray = np.asarray(dec, dtype=np.float64)
+        self.mag: np.ndarray = np.asarray(mag, dtype=np.float64)
+        self.hd: np.ndarray = np.asarray(hd, dtype=np.int32)
+        self.hr: np.ndarray = np.asarray(hr, dtype=np.int32)
+        self.name_bayer: StringColumn = name_bayer
+        self.name_bayer_full: StringColumn = name_bayer_full
+        self.name_english: StringColumn = name_english
+        self.name_flamsteed_full: StringColumn = name_flamsteed_full
+
+        # The motions of the stars, which default to zero
+        zeros: np.ndarray = np.zeros(self.ra.shape[0], dtype=np.float64)
+        self.pm_ra: np.ndarray = zeros if pm_ra is None else np.asarray(pm_ra, dtype=np.float64)
+        self.pm_dec: np.ndarray = zeros if pm_dec is None else np.asarray(pm_dec, dtype=np.float64)
+        self.parallax: np.ndarray = zeros if parallax is None else np.asarray(parallax, dtype=np.float64)
+        self.radial_velocity: np.ndarray = (zeros if radial_velocity is None
+                                            else np.asarray(radial_velocity, dtype=np.float64))
+
+        # Index used to look up stars by HD number; built on first use
+        self._hd_order: Optional[np.ndarray] = None
+
+        # Positions of the stars in ecliptic coordinates, and an index of them by magnitude; computed on first use
+        self._ecliptic_positions: Optional[EclipticPositions] = None
+        self._magnitude_index: Optional[MagnitudeLatitudeIndex] = None
+
+        # Index of the directions of the stars on the sky; built on first use
+        self._angular_index: Optional[AngularIndex] = None
+
+    def __len__(self) -> int:
+        return self.ra.shape[0]
+
+    def take(self, indices: np.ndarray) -> 'StarTable':
+        """
+        Return a new table containing only the stars with the specified indices.
+
+        :param indices:
+            Array of row indices, or a Boolean mask
+        :return:
+            StarTable
+        """
+        return StarTable(**{column: getattr(self, column)[indices] for column in self.numeric_columns},
+                         **{column: getattr(self, column).take(indices) for column in self.name_columns})
+
+    def row(self, index: int) -> StarTuple:
+        """
+        Return the star in a particular row of the table, as a tuple of
+        (ra, dec, mag, name_bayer, name_bayer_full, name_english, name_flamsteed_full).
+
+        :param index:
+            The row number of the star
+        :return:
+            Tuple
+        """
+        return (float(self.ra[index]), float(self.dec[index]), float(self.mag[index]),
+                self.name_bayer[index], self.name_bayer_full[index],
+                self.name_english[index], self.name_flamsteed_full[index])
+
+    def index_of_hd(self, hd: int) -> int:
+        """
+        Look up the row number of the star with a particular HD number.
+
+        :param hd:
+            The HD number of the star
+        :return:
+            Row number within this table
+        """
+        if self._hd_order is None:
+            self._hd_order = np.argsort(self.hd, kind='stable')
+        position: int = int(np.searchsorted(self.hd, hd, sorter=self._hd_order))
+        if position >= self.hd.shape[0] or self.hd[self._hd_order[position]] != hd:
+            raise KeyError(hd)
+        return int(self._hd_order[position])
+
+    def ecliptic_positions(self) -> EclipticPositions:
+        """
+        Return the positions of all the stars in ecliptic coordinates (J2000). These are computed on first use, and
+        shared by every subsequent render.
+
+        :return:
+            EclipticPositions
+        """
+        if self._ecliptic_positions is None:
+            lng, lat = ra_dec_to_ecliptic_array(ra=self.ra * 12 / 180, dec=self.dec)
+            self._ecliptic_positions = EclipticPositions(lng=lng, lat=lat)
+        return self._ecliptic_positions
+
+    def positions_at_epoch(self, epoch: Union[float, np.ndarray],
+                           rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the positions of stars at another epoch, allowing for their proper motions.
+
+        :param epoch:
+            The epoch, or array of epochs, Julian years. If an array of m epochs is given, the returned arrays have
+            one row per epoch.
+        :param rows:
+            Array of the row numbers of the stars to return, or a Boolean mask. If None, all stars are returned.
+        :return:
+            Tuple of arrays (ra, dec), degrees
+        """
+        if rows is None:
+            rows = slice(None)
+        return propagate_positions(ra=self.ra[rows], dec=self.dec[rows],
+                                   pm_ra=self.pm_ra[rows], pm_dec=self.pm_dec[rows], epoch=epoch,
+                                   parallax=self.parallax[rows], radial_velocity=self.radial_velocity[rows])
+
+    def maximum_displacement(self, epoch: float) -> float:
+        """
+        Return the furthest distance that any star in this table moves across the sky between J2000 and another
+        epoch.
+
+        :param epoch:
+            The epoch, Julian years
+        :return:
+            Angular distance, degrees
+        """
+        return maximum_displacement(pm_ra=self.pm_ra, pm_dec=self.pm_dec, epoch=epoch,
+                                    parallax=self.parallax, radial_velocity=self.radial_velocity)
+
+    def query(self, magnitude_limit: float, lat_min: float = -90, lat_max: float = 90) -> np.ndarray:
+        """
+        Find all the stars at least as bright as a magnitude limit, within a range of ecliptic latitude. The index
+        used to find them is built on first use.
+
+        :param magnitude_limit:
+            The faintest magnitude of star to return
+        :param lat_min:
+            The lowest ecliptic latitude of star to return, degrees
+        :param lat_max:
+            The highest ecliptic latitude of star to return, degrees
+        :return:
+            Array of the row numbers of the stars found, in ascending order
+        """
+        if self._magnitude_index is None:
+            self._magnitude_index = MagnitudeLatitudeIndex(mag=self.mag, lat=self.ecliptic_positions().lat)
+        return self._magnitude_index.query(magnitude_limit=magnitude_limit, lat_min=lat_min, lat_max=lat_max)
+
+    def angular_index(self) -> AngularIndex:
+        """
+        Return an index of the directions of all the stars on the sky (J2000). This is built on first use, and
+        shared by every subsequent query.
+
+        :return:
+            AngularIndex
+        """
+        if self._angular_index is None:
+            self._angular_index = AngularIndex(ra=self.ra, dec=self.dec, mag=self.mag)
+        return self._angular_index
+
+    def nearest_stars(self, direction: Sequence[float], k: int = 1,
+                      magnitude_limit: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k stars in this table closest to a direction on the sky, at J2000.
+
+        :param direction:
+            Vector (x, y, z) pointing in the direction to search around, in the J2000 equatorial frame
+        :param k:
+            The number of stars to return
+        :param magnitude_limit:
+            The faintest magnitude of star to return
+        :return:
+            Tuple of arrays (row numbers, angular distances / degrees), nearest first
+        """
+        return self.angular_index().nearest(direction=direction, k=k, magnitude_limit=magnitude_limit)
+
+    def match_positions(self, ra: np.ndarray, dec: np.ndarray, max_separation: float = 0.1,
+                        chunk_size: int = 256) -> np.ndarray:
+        """
+        Find the star in this table at each of an array of positions on the sky, at J2000.
+
+        :param ra:
+            Array of right ascensions, degrees
+        :param dec:
+            Array of declinations, degrees
+        :param max_separation:
+            The furthest a star may lie from a position and still be matched to it, degrees
+        :param chunk_size:
+            The number of positions to match at once, which bounds the memory used
+        :return:
+            Array of row numbers, with the same shape as <ra>, or -1 where no star lies within <max_separation>
+        """
+        directions: np.ndarray = unit_vectors(ra=ra, dec=dec).reshape((-1, 3))
+        stars: np.ndarray = self.angular_index().vectors
+        rows: np.ndarray = np.full(directions.shape[0], -1, dtype=np.int64)
+
+        for start in range(0, directions.shape[0], chunk_size):
+            cos_distance: np.ndarray = directions[start:start + chunk_size] @ stars.T
+            nearest: np.ndarray = np.argmax(cos_distance, axis=1)
+            matched: np.ndarray = (np.take_along_axis(cos_distance, nearest[:, np.newaxis], axis=1)[:, 0] >=
+                                   np.cos(max_separation * unit_deg))
+            rows[start:start + chunk_size] = np.where(matched, nearest, -1)
+
+        return rows.reshape(np.shape(ra))
+
+    def save(self, directory: str) -> None:
+        """
+        Write this table to disk, as a directory containing one .npy file per column. The directory is written
+        atomically, so that other processes never see a partially-written table.
+
+        :param directory:
+            The directory to create
+        :return:
+            None
+        """
+        temporary_directory: str = "{}.tmp{:d}".format(directory, os.getpid())
+        os.makedirs(temporary_directory, exist_ok=True)
+
+        for column in self.numeric_columns:
+            np.save(os.path.join(temporary_directory, "{}.npy".format(column)), getattr(self, column))
+        for column in self.name_columns:
+            np.save(os.path.join(temporary_directory, "{}_codes.npy".format(column)), getattr(self, column).codes)
+            np.save(os.path.join(temporary_directory, "{}_values.npy".format(column)), getattr(self, column).values)
+
+        try:
+            os.rename(temporary_directory, directory)
+        except OSError:
+            # Another process has already written this table
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'StarTable':
+        """
+        Read a table which was written to disk by <save>.
+
+        :param directory:
+            The directory to read
+        :param mmap_mode:
+            The mode in which to memory-map the numeric columns (see <numpy.load>), or None to read them into memory
+        :return:
+            StarTable
+        """
+        columns: Dict[str, Union[np.ndarray, StringColumn]] = {}
+
+        for column in cls.numeric_columns:
+            columns[column] = np.load(os.path.join(directory, "{}.npy".format(column)), mmap_mode=mmap_mode)
+        for column in cls.name_columns:
+            columns[column] = StringColumn(
+                codes=np.load(os.path.join(directory, "{}_codes.npy".format(column)), mmap_mode=mmap_mode),
+                values=np.load(os.path.join(directory, "{}_values.npy".format(column)))
+            )
+
+        return cls(**columns)
+
+    def as_dict(self) -> 'StarTableView':
+        """
+        Return a read-only view of this table, which behaves like a dictionary of star tuples indexed by HD number.
+        """
+        return StarTableView(table=self)
+
+
+class StarTableView(Mapping[int, StarTuple]):
+    """
+    A read-only view of a StarTable, which behaves like a dictionary of tuples of
+    (ra, dec, mag, name_bayer, name_bayer_full, name_english, name_flamsteed_full), indexed by HD number.
+    """
+
+    def __init__(self, table: StarTable):
+        self.table: StarTable = table
+
+    def __getitem__(self, hd: int) -> StarTuple:
+        return self.table.row(self.table.index_of_hd(hd))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.table.hd.tolist())
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __contains__(self, hd: object) -> bool:
+        try:
+            self.table.index_of_hd(hd)
+        except (KeyError, TypeError):
+            return False
+        return True
+
@@ -23,16 +23,28 @@ Render the star wheel for the precession planisphere.
 """
 
 import re
-from math import pi, sin, cos, atan2, asin, hypot
-from typing import Dict, Tuple
+from math import atan2
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from bright_stars_process import fetch_bright_star_list
-from constants import unit_deg, unit_rev, unit_mm, unit_cm, inclination_ecliptic, r_1, r_gap, central_hole_size, radius
+import numpy as np
+
+from bright_stars_process import fetch_star_table, star_catalog_filename, star_names_filename
+from constellations import ConstellationGeometry, constellation_names_filename, fetch_constellation_geometry, \
+    stick_figures_filename
+from constants import unit_rev, unit_mm, unit_cm, inclination_ecliptic, r_1, r_gap, central_hole_size, radius, \
+    ra_dec_to_ecliptic_array, dec_span, star_magnitude_limit, EclipticPositions
 from graphics_context import BaseComponent, GraphicsContext
+from precession import celestial_pole_ecliptic_coordinates, precession_period
+from proper_motion import catalog_epoch
 from settings import fetch_command_line_arguments
+from star_stream import catalog_layouts, stream_projected_stars
+from star_table import StarTable
 from text import text
 from themes import themes
 
+# The epochs at which we evaluate the position of the celestial pole, to trace its path over one precession cycle
+pole_path_epochs: np.ndarray = np.linspace(2000 - precession_period / 2, 2000 + precession_period / 2, 721)
+
 
 class StarWheel(BaseComponent):
     """
@@ -61,26 +73,49 @@ class StarWheel(BaseComponent):
             'y_max': r_1 + 4 * unit_mm
         }
 
-    @staticmethod
-    def ra_dec_to_ecliptic_coordinates(ra: float, dec: float) -> Tuple[float, float]:
-        ra = float(ra)
-        dec = float(dec)
+    def data_files(self, settings: dict) -> List[str]:
+        """
+        Report the data files read by this component: the constellation data, and the Yale Bright Star Catalogue
+        unless the stars are drawn from an external catalogue.
 
-        hr: float = pi / 12
-        deg: float = pi / 180
+        :param settings:
+            A dictionary of settings required by the renderer.
+        :return:
+            List of filenames
+        """
+        filenames: List[str] = [stick_figures_filename, constellation_names_filename]
+        if settings.get('star_catalog') is None:
+            filenames += [star_catalog_filename, star_names_filename]
+        return filenames
 
-        x: float = cos(ra * hr) * cos(dec * deg)
-        y: float = sin(ra * hr) * cos(dec * deg)
-        z: float = sin(dec * deg)
+    @classmethod
+    def ra_dec_to_ecliptic_coordinates_array(cls, ra: np.ndarray, dec: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert arrays of equatorial coordinates into ecliptic coordinates (J2000).
 
-        x2: float = x
-        y2: float = y * cos(inclination_ecliptic * deg) + z * sin(inclination_ecliptic * deg)
-        z2: float = -y * sin(inclination_ecliptic * deg) + z * cos(inclination_ecliptic * deg)
+        :param ra:
+            Array of right ascensions, hours
+        :param dec:
+            Array of declinations, degrees
+        :return:
+            Tuple of arrays (ecliptic longitude, ecliptic latitude), degrees
+        """
+        return ra_dec_to_ecliptic_array(ra=ra, dec=dec)
 
-        lat: float = asin(z2) / deg
-        lng: float = atan2(y2, x2) / deg
+    @classmethod
+    def ra_dec_to_ecliptic_coordinates(cls, ra: float, dec: float) -> Tuple[float, float]:
+        """
+        Convert a single point from equatorial coordinates into ecliptic coordinates (J2000).
 
-        return lng, lat
+        :param ra:
+            Right ascension, hours
+        :param dec:
+            Declination, degrees
+        :return:
+            Tuple (ecliptic longitude, ecliptic latitude), degrees
+        """
+        lng, lat = cls.ra_dec_to_ecliptic_coordinates_array(ra=float(ra), dec=float(dec))
+        return float(lng), float(lat)
 
     def do_rendering(self, settings: dict, context: GraphicsContext) -> None:
         """
@@ -122,10 +157,21 @@ class StarWheel(BaseComponent):
         # Combine these two paths to make a clipping path for drawing the star wheel
         context.clip()
 
-        # Draw lines of constant ecliptic latitude for path of north pole
+        # Draw the path of the celestial pole over one precession cycle centred on J2000, as given by the
+        # long-term precession model. On a southern hemisphere planisphere, this is the path of the south pole.
+        pole_lng, pole_lat = celestial_pole_ecliptic_coordinates(epoch=pole_path_epochs)
+        if is_southern:
+            pole_lng, pole_lat = pole_lng + 180, -pole_lat
+        pole_x, pole_y, pole_r = EclipticPositions(lng=pole_lng, lat=pole_lat).project(latitude=latitude,
+                                                                                      southern=is_southern)
+        if np.all(pole_r <= r_2):
+            context.begin_path()
+            context.polylines(lines=((pole_x, pole_y),))
+            context.stroke(color=theme['grid'])
+
+        # Draw lines of constant ecliptic latitude for the ecliptic, and for the path of the opposite pole
         lat: float
-        for lat in (90 - inclination_ecliptic,
-                    0,
+        for lat in (0,
                     -90 + inclination_ecliptic):
             # Convert latitude into radius from the centre of the planisphere
             r: float = radius(dec=lat, latitude=latitude)
@@ -135,120 +181,97 @@ class StarWheel(BaseComponent):
             context.circle(centre_x=0, centre_y=0, radius=r)
             context.stroke(color=theme['grid'])
 
-        # Draw constellation stick figures
-        with open("raw_data/constellation_stick_figures.dat", "rt") as f_in:
-            for line in f_in:
-                line: str = line.strip()
-
-                # Ignore blank lines and comment lines
-                if (len(line) == 0) or (line[0] == '#'):
-                    continue
-
-                # Split line into words.
-                # These are the names of the constellations, and the start and end points for each stroke.
-                name: str
-                ra1_str: str
-                dec1_str: str
-                ra2_str: str
-                dec2_str: str
-                name, ra1_str, dec1_str, ra2_str, dec2_str = line.split()
-
-                lng1: float
-                lat1: float
-                lng2: float
-                lat2: float
-                lng1, lat1 = self.ra_dec_to_ecliptic_coordinates(ra=float(ra1_str) * 12 / 180, dec=float(dec1_str))
-                lng2, lat2 = self.ra_dec_to_ecliptic_coordinates(ra=float(ra2_str) * 12 / 180, dec=float(dec2_str))
-
-                # If we're making a southern hemisphere planisphere, we flip the sky upside down
-                if is_southern:
-                    lng1 *= -1
-                    lng2 *= -1
-                    lat1 *= -1
-                    lat2 *= -1
-
-                # Project RA and Dec into radius and azimuth in the planispheric projection
-                r_point_1: float = radius(dec=lat1, latitude=latitude)
-                if r_point_1 > r_2:
-                    continue
-
-                r_point_2: float = radius(dec=lat2, latitude=latitude)
-                if r_point_2 > r_2:
-                    continue
-
-                p1: Tuple[float, float] = (-r_point_1 * cos(lng1 * unit_deg), -r_point_1 * sin(lng1 * unit_deg))
-                p2: Tuple[float, float] = (-r_point_2 * cos(lng2 * unit_deg), -r_point_2 * sin(lng2 * unit_deg))
-
-                # Impose a maximum length of 4 cm on constellation stick figures; they get quite distorted at the edge
-                if hypot(p2[0] - p1[0], p2[1] - p1[1]) > 4 * unit_cm:
-                    continue
-
-                # Stroke a line
-                context.begin_path()
-                context.move_to(x=p1[0], y=p1[1])
-                context.line_to(x=p2[0], y=p2[1])
-                context.stroke(color=theme['stick'], line_width=1, dotted=True)
-
-        # Draw stars from Yale Bright Star Catalogue
-        for star_descriptor in fetch_bright_star_list()['stars'].values():
-            ra, dec, mag = star_descriptor[:3]
-
-            # Discard stars fainter than mag 4
-            if mag == "-" or float(mag) > 4.0:
-                continue
+        magnitude_limit: float = settings.get('magnitude_limit', star_magnitude_limit)
+        star_catalog: Optional[str] = settings.get('star_catalog')
+        epoch: float = settings.get('epoch', catalog_epoch)
+
+        # We only know the proper motions of the stars in the Yale Bright Star Catalogue
+        if star_catalog is not None and epoch != catalog_epoch:
+            raise ValueError("The stars in an external catalogue can only be drawn at the epoch J2000, not {}"
+                             .format(epoch))
+
+        # Draw constellation stick figures. If we're showing the stars at another epoch, the ends of each line move
+        # with the stars at those positions.
+        constellations: ConstellationGeometry = fetch_constellation_geometry()
+        if epoch != catalog_epoch:
+            constellations = constellations.at_epoch(table=fetch_star_table(), epoch=epoch)
+
+        # Project the ends of each line into the planispheric projection. If we're making a southern hemisphere
+        # planisphere, this flips the sky upside down.
+        p_x, p_y, r_point = constellations.sticks.project(latitude=latitude, southern=is_southern)
+        p1_x, p2_x = p_x[:, 0], p_x[:, 1]
+        p1_y, p2_y = p_y[:, 0], p_y[:, 1]
+        r_point_1, r_point_2 = r_point[:, 0], r_point[:, 1]
+
+        # Discard strokes which extend beyond the edge of the star chart, and impose a maximum length of 4 cm on
+        # constellation stick figures; they get quite distorted at the edge
+        visible: np.ndarray = ((r_point_1 <= r_2) & (r_point_2 <= r_2) &
+                               (np.hypot(p2_x - p1_x, p2_y - p1_y) <= 4 * unit_cm))
+
+        # Stroke all the lines as a single path
+        context.begin_path()
+        context.segments(x0=p1_x[visible], y0=p1_y[visible], x1=p2_x[visible], y1=p2_y[visible])
+        context.stroke(color=theme['stick'], line_width=1, dotted=True)
 
-            lng, lat = self.ra_dec_to_ecliptic_coordinates(ra=ra * 12 / 180, dec=dec)
+        star_batches: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]
 
-            # If we're making a southern hemisphere planisphere, we flip the sky upside down
-            if is_southern:
-                lng *= -1
-                lat *= -1
+        if star_catalog is None:
+            # Draw stars from Yale Bright Star Catalogue
+            stars: StarTable = fetch_star_table()
 
-            r = radius(dec=lat, latitude=latitude)
-            if r > r_2:
-                continue
+            # If we're showing the stars at another epoch, allow for stars moving into view from beyond the edge
+            margin: float = stars.maximum_displacement(epoch=epoch) if epoch != catalog_epoch else 0
 
-            # Represent each star with a small circle
-            context.begin_path()
-            context.circle(centre_x=-r * cos(lng * unit_deg), centre_y=-r * sin(lng * unit_deg),
-                           radius=0.18 * unit_mm * (5 - mag))
-            context.fill(color=theme['star'])
+            # Find the stars bright enough to show, within the ecliptic latitudes visible on the star wheel
+            if is_southern:
+                rows: np.ndarray = stars.query(magnitude_limit=magnitude_limit, lat_max=dec_span - 90 + margin)
+            else:
+                rows = stars.query(magnitude_limit=magnitude_limit, lat_min=90 - dec_span - margin)
+
+            # Move the stars to their positions at the requested epoch
+            if epoch != catalog_epoch:
+                ra, dec = stars.positions_at_epoch(epoch=epoch, rows=rows)
+                star_positions: EclipticPositions = EclipticPositions(
+                    *ra_dec_to_ecliptic_array(ra=ra * 12 / 180, dec=dec))
+            else:
+                star_positions = stars.ecliptic_positions().take(rows)
+
+            mag: np.ndarray = stars.mag[rows]
+            star_x, star_y, r = star_positions.project(latitude=latitude, southern=is_southern)
+            visible = r <= r_2
+            star_batches = ((star_x[visible], star_y[visible], mag[visible]),)
+        else:
+            # Draw stars from a large external catalogue, which we read in chunks to limit memory usage
+            star_batches = stream_projected_stars(filename=star_catalog,
+                                                  layout=catalog_layouts[settings.get('catalog_layout', 'bsc')],
+                                                  magnitude_limit=magnitude_limit,
+                                                  latitude=latitude, southern=is_southern)
+
+        # Represent each star with a small circle, with each batch of stars filled at once. The faintest stars shown
+        # are always the same size, whatever the magnitude limit.
+        for star_x, star_y, star_mag in star_batches:
+            context.discs(xs=star_x, ys=star_y,
+                          radii=0.18 * unit_mm * (magnitude_limit + 1 - star_mag),
+                          color=theme['star'])
 
         # Write constellation names
         context.set_font_size(0.7)
         context.set_color(theme['constellation'])
 
-        # Open a list of the coordinates where we place the names of the constellations
-        with open("raw_data/constellation_names.dat") as f_in:
-            for line in f_in:
-                line = line.strip()
-
-                # Ignore blank lines and comment lines
-                if (len(line) == 0) or (line[0] == '#'):
-                    continue
+        label_x, label_y, r = constellations.labels.project(latitude=latitude, southern=is_southern)
 
-                # Split line into words
-                name, ra_str, dec_str = line.split()[:3]
-
-                # Translate constellation name into the requested language, if required
-                if name in text[language]['constellation_translations']:
-                    name = text[language]['constellation_translations'][name]
-
-                lng, lat = self.ra_dec_to_ecliptic_coordinates(ra=float(ra_str), dec=float(dec_str))
+        for name, r_label, x, y in zip(constellations.label_names, r.tolist(), label_x.tolist(), label_y.tolist()):
+            if r_label > r_2:
+                continue
 
-                # If we're making a southern hemisphere planisphere, we flip the sky upside down
-                if is_southern:
-                    lng *= -1
-                    lat *= -1
+            # Translate constellation name into the requested language, if required
+            if name in text[language]['constellation_translations']:
+                name = text[language]['constellation_translations'][name]
 
-                # Render name of constellation, with _s turned into spaces
-                name2: str = re.sub("_", " ", name)
-                r = radius(dec=lat, latitude=latitude)
-                if r > r_2:
-                    continue
-                p: Tuple[float, float] = (-r * cos(lng * unit_deg), -r * sin(lng * unit_deg))
-                a: float = atan2(p[0], p[1])
-                context.text(text=name2, x=p[0], y=p[1], h_align=0, v_align=0, gap=0, rotation=unit_rev / 2 - a)
+            # Render name of constellation, with _s turned into spaces
+            name2: str = re.sub("_", " ", name)
+            a: float = atan2(x, y)
+            context.text(text=name2, x=x, y=y, h_align=0, v_align=0, gap=0, rotation=unit_rev / 2 - a)
 
         # Draw arrow for lining up with the year scale
         context.begin_path()
@@ -278,6 +301,10 @@ if __name__ == "__main__":
         'southern': arguments['southern'],
         'language': 'en',
         'theme': arguments['theme'],
+        'magnitude_limit': arguments['magnitude_limit'],
+        'star_catalog': arguments['star_catalog'],
+        'catalog_layout': arguments['catalog_layout'],
+        'epoch': arguments['epoch']
     }).render_to_file(
         filename=arguments['filename'],
         img_format=arguments['img_format'],
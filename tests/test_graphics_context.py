@@ -0,0 +1,72 @@
+# test_graphics_context.py
+# -*- coding: utf-8 -*-
+#
+# The python script in this file makes the various parts of a precession
+# planisphere.
+#
+# Copyright (C) 2014-2024 Dominic Ford <https://dcford.org.uk/>
+#
+# This code is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# You should have received a copy of the GNU General Public License along with
+# this file; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+# ----------------------------------------------------------------------------
+
+"""
+Tests of the drawing primitives in graphics_context.py.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# cairocffi raises OSError, rather than ImportError, if the cairo library itself is not installed
+try:
+    import cairocffi  # noqa: F401
+except (ImportError, OSError):
+    pytest.skip("cairo is not available", allow_module_level=True)
+
+from graphics_context import GraphicsContext, GraphicsPage  # noqa: E402
+
+
+def pixel_alpha(page: GraphicsPage, x: float, y: float) -> int:
+    """
+    Return the alpha value of the pixel at a position on an in-memory image page.
+
+    :param page:
+        A GraphicsPage of format "image"
+    :param x:
+        The horizontal position of the pixel, metres
+    :param y:
+        The vertical position of the pixel, metres
+    :return:
+        Alpha value, from 0 to 255
+    """
+    page.surface.flush()
+    stride: int = page.surface.get_stride()
+    pixels: np.ndarray = np.frombuffer(page.surface.get_data(), dtype=np.uint32).reshape((page.height, stride // 4))
+    return int(pixels[int(y * page.dots_per_metre), int(x * page.dots_per_metre)] >> 24)
+
+
+def test_overlapping_discs_are_filled_solidly():
+    # A page 1 cm square, at 100 pixels per cm
+    page: GraphicsPage = GraphicsPage(img_format="image", width=0.01, height=0.01, dots_per_inch=254)
+    context: GraphicsContext = GraphicsContext(page=page)
+
+    # Two discs which overlap, and two discs which lie exactly on top of each other
+    context.discs(xs=np.array([0.004, 0.006, 0.005, 0.005]), ys=np.array([0.003, 0.003, 0.007, 0.007]),
+                  radii=np.array([0.002, 0.002, 0.001, 0.001]), color=(0, 0, 0, 1))
+
+    assert pixel_alpha(page=page, x=0.005, y=0.003) == 255
+    assert pixel_alpha(page=page, x=0.005, y=0.007) == 255
+    assert pixel_alpha(page=page, x=0.003, y=0.003) == 255
+    assert pixel_alpha(page=page, x=0.009, y=0.009) == 0
@@ -43,6 +43,49 @@ text: Dict[str, dict] = {
                 "It will become a viewing window through which to look at the star wheel behind."
             ),
             "constellation_translations": {
-            }
+            },
+            "kit_header": "DEMONSTRATING THE PRECESSION OF THE EQUINOXES",
+            "kit_footer": "\u00A9 2020\u20132024 Dominic Ford. Distributed under the GNU General Public License, version 3. Document downloaded from https://in-the-sky.org/precession/",
+            "kit_title": "Demonstrating the precession of the equinoxes with a planisphere",
+            "kit_author": "Dominic Ford",
+            "kit_caption_starwheel": "The planisphere's central star wheel, which should be sandwiched inside the folded holder.",
+            "kit_caption_ra_dec": "This grid of lines can optionally be printed onto transparent plastic and glued into the cut out window in the planisphere's body to show the changing right ascensions and declinations of objects in the sky.",
+            # The instruction pages at the front of the kit. Each page is a list of (style, text) blocks, where style is
+            # "h" for a heading, "p" for a paragraph, "b" for a bold paragraph, or "li" for an item in a bulleted list.
+            "kit_instructions": (
+                (
+                    ("p", "The precession of the equinoxes is a gradual changing in the direction of the Earth's rotation axis, which causes the position of the celestial poles to drift through the constellations at a continuous rate of roughly 20 arcseconds per year. Although this effect is small on short timescales, the accumulated drift adds up to about one Moon diameter per century."),
+                    ("p", "Currently the Earth's north celestial pole points close to the star Polaris, but this will not always be the case. By 2500, Polaris will be several degrees away from the true celestial pole."),
+                    ("p", "A conventional planisphere is a simple hand-held device which shows a map of which stars are visible in the night sky at any particular time. By adapting the design of the planisphere, it is possible to build a similar instrument which, instead of demonstrating the rotation of the night sky around the celestial poles, instead demonstrates the movement of the celestial poles due to the precession of the equinoxes."),
+                    ("p", "I have created kits for building two models of planisphere for demonstrating the precession of the equinoxes. One shows the effect of the precession of the equinoxes on the northern sky. Specifically, it shows the precession of the north celestial pole through the northern sky. The other shows the effect of the precession of the equinoxes on the southern sky."),
+                    ("p", "You can download these here: https://in-the-sky.org/precession/"),
+                    ("p", "The planisphere presented in this document is designed to show the {ns_full} sky."),
+                    ("h", "What you need"),
+                    ("li", "Two sheets of A4 paper, or preferably thin card."),
+                    ("li", "Scissors."),
+                    ("li", "A split-pin fastener."),
+                    ("li", "Optional: one sheet of transparent plastic, e.g. acetate designed for use with overhead projectors."),
+                    ("li", "Optional: A little glue."),
+                    ("h", "Assembly instructions"),
+                    ("p", "Step 1 \u2013 Print the pages at the back of this PDF file, showing the star wheel and the body of the planisphere, onto two separate sheets of paper, or more preferably onto thin card."),
+                    ("p", "Step 2 \u2013 Carefully cut out the star wheel and the body of the planisphere. Also cut out the shaded grey area of the planisphere's body, and if you have it, the grid of lines which you have printed onto transparent plastic. If you are using cardboard, you may wish to carefully score the body of the planisphere along the dotted line to make it easier to fold it along this line later."),
+                ),
+                (
+                    ("p", "Step 3 \u2013 The star wheel has a small circle at its center, and the planisphere's body has a matching small circle at the bottom. Make a small hole (about 2mm across) in each. If a paper drill is to hand, these are ideal, otherwise use a compass point and enlarge the hole by turning in a circular motion."),
+                    ("p", "Step 4 \u2013 Slot a split-pin fastener through the middle of the star wheel, with the head of the fastener against the printed side of the star wheel. Then slot the body of the planisphere onto the same fastener, with the printed side facing the back of the fastener. Fold the fastener down to secure the two sheets of cardboard together."),
+                    ("p", "Step 5 (Optional) \u2013 If you printed the final page of the PDF file onto a sheet of plastic, you should now stick this grid of lines over the viewing window which you cut out from the body of the planisphere."),
+                    ("p", "Step 6 \u2013 Fold the body of the planisphere along the dotted line, so that the front of the star wheel shows through the window which you cut in the body."),
+                    ("b", "Congratulations, your planisphere is now ready to demonstrate the precession of the equinoxes!"),
+                    ("h", "How to use your planisphere"),
+                    ("p", "On this special design of planisphere, the sky is projected onto the star wheel with the north ecliptic pole at the center. The grey lines marked onto the transparent plastic window indicate the right ascension and declination of the stars behind."),
+                    ("p", "As the star wheel is rotated, the position of the north celestial pole turns in circles around the ecliptic pole, simulating how the celestial coordinates of stars change over time due to the precession of the equinoxes."),
+                    ("p", "Turn the starwheel until the arrow on its edge lines up with the scale of years marked around the top of the planisphere. The viewing window will now show all of the stars in the celestial northern or southern hemisphere in this year."),
+                    ("p", "You can read off the changing celestial coordinates of stars over time using the grid of lines of constant right ascension and declination marked onto the transparent plastic window."),
+                    ("h", "Customised planispheres"),
+                    ("p", "This planisphere kit was designed using a collection of Python scripts and the pycairo graphics library. If you would like to customise your planisphere, you are welcome to download the scripts from my GitHub account and modify them, providing you credit the source: https://github.com/dcf21/precession"),
+                    ("h", "License"),
+                    ("p", "Like everything else on In-The-Sky.org, these planisphere kits are \u00A9 Dominic Ford. However, everything on In-The-Sky.org is provided for the benefit of amateur astronomers worldwide, and you are welcome to modify and/or redistribute any of the material on this website, under the following conditions: (1) Any item that has an associated copyright text must include that unmodified text in your redistributed version, (2) You must credit me, Dominic Ford, as the original author and copyright holder, (3) You may not derive any profit from your reproduction of material on this website, unless you are a registered charity whose express aim is the advancement of astronomical science, or you have the written permission of the author."),
+                ),
+            )
         }
 }